@@ -67,6 +67,9 @@ if os.environ.get('ENABLE_CRONTAB', '').lower() == 'true':
 BLING_CLIENT_ID = os.environ.get("BLING_CLIENT_ID", "")
 BLING_CLIENT_SECRET = os.environ.get("BLING_CLIENT_SECRET", "")
 BLING_REDIRECT_URI = os.environ.get("BLING_REDIRECT_URI", "https://arlicenter-api.onrender.com/auth/callback/")
+# Backup do token em arquivo local no callback OAuth (desabilitado por padrão;
+# o Firestore é a fonte oficial e os arquivos com timestamp crescem sem limite)
+BLING_WRITE_LOCAL_BACKUP = os.environ.get("BLING_WRITE_LOCAL_BACKUP", "False").lower() == "true"
 
 # Configurações do Firebase
 FIREBASE_CREDENTIALS_PATH = os.environ.get("FIREBASE_CREDENTIALS_PATH", os.path.join(BASE_DIR, 'firebase-credentials.json'))
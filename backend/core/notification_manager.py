@@ -19,6 +19,9 @@ from pathlib import Path
 # Configurar logger
 logger = logging.getLogger(__name__)
 
+# Timeout (conexão, leitura) para requisições HTTP de notificação
+_REQUEST_TIMEOUT = (3.05, 15)
+
 class NotificationManager:
     """
     Classe para gerenciar notificações de expiração de tokens.
@@ -339,7 +342,7 @@ class NotificationManager:
                 # Se a URL já é a URL completa, retorna ela mesma
                 if "https://" in self.url_authorization:
                     # Faz uma requisição para obter a URL real de autorização
-                    response = requests.get(self.url_authorization)
+                    response = requests.get(self.url_authorization, timeout=_REQUEST_TIMEOUT)
                     if response.status_code == 200:
                         data = response.json()
                         return data.get("authorization_url")
@@ -718,7 +721,7 @@ class NotificationManager:
                 auth = (twilio_account_sid, twilio_auth_token)
                 
                 # Faz a requisição
-                response = requests.post(url, data=data, auth=auth)
+                response = requests.post(url, data=data, auth=auth, timeout=_REQUEST_TIMEOUT)
                 
                 # Verifica se a requisição foi bem-sucedida
                 if response.status_code >= 200 and response.status_code < 300:
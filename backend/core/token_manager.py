@@ -32,6 +32,19 @@ import base64
 # Configurar logger
 logger = logging.getLogger(__name__)
 
+# Timeout (conexão, leitura) para chamadas à API do Bling
+_REQUEST_TIMEOUT = (3.05, 15)
+
+# Diretório de fallback local de tokens, resolvido e criado uma única vez no
+# import em vez de recompor o caminho (e repetir o mkdir) em cada método
+try:
+    _TOKENS_DIR = Path(__file__).resolve().parent.parent / 'bling_tokens'
+    _TOKENS_DIR.mkdir(exist_ok=True)
+except OSError as _dir_error:
+    logging.warning(f"Não foi possível criar o diretório bling_tokens: {str(_dir_error)}")
+    _TOKENS_DIR = Path('/tmp', 'bling_tokens')
+    _TOKENS_DIR.mkdir(exist_ok=True, parents=True)
+
 class TokenManager:
     """
     Classe para gerenciar tokens do Bling no Firebase Firestore
@@ -67,15 +80,26 @@ class TokenManager:
                 'last_used': firestore.SERVER_TIMESTAMP,
                 'active': True
             }
-            
-            # Desativa tokens ativos anteriores
-            self._deactivate_active_tokens()
-            
-            # Adiciona o novo token
-            doc_ref = self.collection.add(token_doc)
-            token_id = doc_ref[1].id
-            
-            logger.info(f"Token criado com sucesso. ID: {token_id}")
+
+            # Desativa os tokens ativos anteriores e grava o novo token numa
+            # única WriteBatch: um commit em vez de um update por token mais
+            # o add, e a troca do token ativo passa a ser atômica (nunca há
+            # um instante com dois ativos ou com nenhum)
+            batch = self.db.batch()
+            deactivated = 0
+            for token_snapshot in self.collection.where('active', '==', True).stream():
+                batch.update(token_snapshot.reference, {
+                    'active': False,
+                    'deactivated_at': firestore.SERVER_TIMESTAMP
+                })
+                deactivated += 1
+
+            new_ref = self.collection.document()
+            batch.set(new_ref, token_doc)
+            batch.commit()
+
+            token_id = new_ref.id
+            logger.info(f"Token criado com sucesso. ID: {token_id} ({deactivated} token(s) anterior(es) desativado(s))")
             return token_id
             
         except Exception as e:
@@ -175,12 +199,10 @@ class TokenManager:
             if not created_at:
                 return True
                 
-            # Converte para datetime se for um timestamp do Firestore
-            # O SERVER_TIMESTAMP é um sentinela e não um tipo, então verificamos de outra forma
-            if hasattr(created_at, 'seconds') and hasattr(created_at, 'nanos'):
-                # É um timestamp do Firestore
-                created_at = datetime.datetime.fromtimestamp(created_at.seconds + created_at.nanos/1e9)
-            elif isinstance(created_at, str):
+            # O cliente do Firestore devolve created_at como
+            # DatetimeWithNanoseconds, que já é subclasse de datetime — só a
+            # string ISO do fallback local precisa de conversão
+            if isinstance(created_at, str):
                 # É uma string ISO (possivelmente de um fallback local)
                 try:
                     created_at = datetime.datetime.fromisoformat(created_at)
@@ -272,7 +294,7 @@ class TokenManager:
             
             # Realiza a requisição
             logger.info(f"Realizando requisição de renovação de token")
-            response = requests.post(url, data=data, headers=headers)
+            response = requests.post(url, data=data, headers=headers, timeout=_REQUEST_TIMEOUT)
             
             # Verifica se a requisição foi bem-sucedida
             if response.status_code != 200:
@@ -312,17 +334,8 @@ class TokenManager:
             token_data (dict): Dados do token
         """
         try:
-            # Define o diretório para salvar os tokens
-            try:
-                tokens_dir = Path(os.path.join(os.path.dirname(os.path.dirname(__file__)), 'bling_tokens'))
-                tokens_dir.mkdir(exist_ok=True)
-            except Exception as dir_error:
-                logger.warning(f"Não foi possível criar o diretório bling_tokens: {str(dir_error)}")
-                tokens_dir = Path(os.path.join('/tmp', 'bling_tokens'))
-                tokens_dir.mkdir(exist_ok=True)
-            
             # Define o nome do arquivo baseado na data/hora atual
-            filename = tokens_dir / f"token_{datetime.datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
+            filename = _TOKENS_DIR / f"token_{datetime.datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
             
             # Adiciona metadados ao token
             token_data_with_metadata = {
@@ -337,7 +350,7 @@ class TokenManager:
                 json.dump(token_data_with_metadata, f, indent=4)
             
             # Salva também um arquivo com nome fixo para facilitar recuperação
-            active_filename = tokens_dir / "token_active.json"
+            active_filename = _TOKENS_DIR / "token_active.json"
             with open(active_filename, 'w') as f:
                 json.dump(token_data_with_metadata, f, indent=4)
             
@@ -354,16 +367,8 @@ class TokenManager:
             dict: Dados do token ou None se não encontrado
         """
         try:
-            # Define o diretório dos tokens
-            tokens_dir = Path(os.path.join(os.path.dirname(os.path.dirname(__file__)), 'bling_tokens'))
-            if not tokens_dir.exists():
-                tokens_dir = Path(os.path.join('/tmp', 'bling_tokens'))
-                if not tokens_dir.exists():
-                    logger.warning("Diretório de tokens não encontrado")
-                    return None
-            
             # Tenta ler o arquivo fixo primeiro
-            active_filename = tokens_dir / "token_active.json"
+            active_filename = _TOKENS_DIR / "token_active.json"
             if active_filename.exists():
                 with open(active_filename, 'r') as f:
                     token_data = json.load(f)
@@ -371,7 +376,7 @@ class TokenManager:
                 return token_data
             
             # Se não encontrar, busca o arquivo mais recente
-            token_files = list(tokens_dir.glob("token_*.json"))
+            token_files = list(_TOKENS_DIR.glob("token_*.json"))
             if not token_files:
                 logger.warning("Nenhum arquivo de token encontrado")
                 return None
@@ -507,18 +512,26 @@ class TokenManager:
         try:
             # Busca todos os tokens
             all_tokens = self.collection.stream()
-            
-            # Cria um batch para as operações de exclusão
+
+            # Exclui em batches: 1 RPC a cada 500 documentos em vez de 1 por
+            # documento. O limite de 500 operações por batch é do Firestore,
+            # por isso o commit parcial quando o lote enche.
             batch = self.db.batch()
-            
+
             count = 0
+            pending = 0
             for token in all_tokens:
-                token_ref = self.collection.document(token.id)
-                batch.delete(token_ref)
+                batch.delete(token.reference)
                 count += 1
-            
-            # Executa o batch
-            batch.commit()
+                pending += 1
+                if pending == 500:
+                    batch.commit()
+                    batch = self.db.batch()
+                    pending = 0
+
+            # Executa o batch com o restante
+            if pending:
+                batch.commit()
             logger.info(f"{count} tokens foram excluídos com sucesso.")
             return count
             
@@ -565,9 +578,6 @@ class TokenManager:
             
             # Salva também o status no arquivo local
             try:
-                tokens_dir = Path(os.path.join(os.path.dirname(os.path.dirname(__file__)), 'bling_tokens'))
-                tokens_dir.mkdir(exist_ok=True)
-                
                 # Adiciona informações de invalidação
                 invalid_token_data = {
                     **token_data,
@@ -578,7 +588,7 @@ class TokenManager:
                 }
                 
                 # Salva em um arquivo específico
-                invalid_filename = tokens_dir / "token_invalid.json"
+                invalid_filename = _TOKENS_DIR / "token_invalid.json"
                 with open(invalid_filename, 'w') as f:
                     json.dump(invalid_token_data, f, indent=4)
                 
@@ -14,6 +14,7 @@ urlpatterns = [
     path('api/produtos/', views.get_bling_produtos, name='get_bling_produtos'),
     path('api/pedidos/', views.get_bling_pedidos, name='get_bling_pedidos'),
     path('api/contatos/', views.get_bling_contatos, name='get_bling_contatos'),
+    path('api/bulk/', views.get_bling_bulk, name='get_bling_bulk'),
     path('api/contatos/<str:id_contato>/', views.get_contato_by_id, name='get_contato_by_id'),
     path('api/teste/cpf/', views.teste_busca_por_cpf, name='teste_busca_por_cpf'),
     path('api/teste/cpf/completo/', views.teste_busca_por_cpf_completo, name='teste_busca_por_cpf_completo'),
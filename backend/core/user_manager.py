@@ -5,6 +5,11 @@ Responsável por criar, buscar, atualizar e verificar usuários.
 
 import logging
 import datetime
+import hashlib
+import hmac
+import secrets
+import threading
+import time
 from firebase_admin import firestore
 import bcrypt
 from django.conf import settings
@@ -15,6 +20,54 @@ logger = logging.getLogger(__name__)
 # Nome da coleção de usuários
 USERS_COLLECTION = 'users'
 
+# TTL do cache de documentos de usuário lidos por CPF: leituras repetidas do
+# mesmo CPF numa sessão (verificar + buscar + atualizar) custam uma viagem ao
+# Firestore cada. O TTL curto limita a janela de desatualização entre workers;
+# as escritas feitas por esta instância invalidam a entrada imediatamente.
+_USER_CACHE_TTL = 60
+
+# Cache em memória do resultado do bcrypt: a verificação é deliberadamente
+# cara (dezenas a centenas de ms), então logins repetidos do mesmo par
+# senha/hash dentro do TTL reaproveitam o resultado. A chave é um HMAC com
+# pepper aleatório do processo — nem a senha nem algo derivável dela sem o
+# pepper fica na memória do cache. A leitura do documento (status do usuário,
+# ultimo_acesso) continua acontecendo a cada chamada; só o KDF é memorizado.
+_VERIFY_CACHE_TTL = 60
+_VERIFY_CACHE_MAX = 1024
+_verify_cache = {}
+_verify_cache_lock = threading.Lock()
+_verify_pepper = secrets.token_bytes(32)
+
+def _check_password_cached(senha, stored_hash):
+    """
+    Compara a senha com o hash armazenado, memorizando o resultado por um TTL curto
+
+    Args:
+        senha: Senha em texto puro
+        stored_hash: Hash bcrypt armazenado no documento do usuário
+
+    Returns:
+        bool: True se a senha corresponde ao hash
+    """
+    key = hmac.new(_verify_pepper, f"{senha}:{stored_hash}".encode('utf-8'), hashlib.sha256).digest()
+    now = time.monotonic()
+
+    with _verify_cache_lock:
+        hit = _verify_cache.get(key)
+        if hit is not None and now < hit[1]:
+            return hit[0]
+
+    # Executa o bcrypt fora do lock para não serializar as verificações
+    result = bcrypt.checkpw(senha.encode('utf-8'), stored_hash.encode('utf-8'))
+
+    with _verify_cache_lock:
+        # Limite simples de tamanho: o cache inteiro é barato de reconstruir
+        if len(_verify_cache) >= _VERIFY_CACHE_MAX:
+            _verify_cache.clear()
+        _verify_cache[key] = (result, now + _VERIFY_CACHE_TTL)
+
+    return result
+
 class UserManager:
     """
     Classe para gerenciar usuários no Firebase Firestore
@@ -28,6 +81,13 @@ class UserManager:
             from core.firebase_config import initialize_firebase
             self.db = initialize_firebase()
             self.collection = self.db.collection(USERS_COLLECTION)
+            self._user_cache = {}
+            self._user_cache_lock = threading.Lock()
+            # CPFs já criados por este processo: barra tentativas repetidas
+            # de criação sem repetir a leitura de existência no Firestore.
+            # O Firestore continua sendo a fonte da verdade — o conjunto só
+            # conhece criações feitas por esta instância.
+            self._created_cpfs = set()
             logger.info("UserManager inicializado com sucesso")
         except Exception as e:
             logger.error(f"Erro ao inicializar UserManager: {str(e)}")
@@ -50,6 +110,12 @@ class UserManager:
             str: ID do documento criado ou None em caso de erro
         """
         try:
+            # Criações repetidas pelo mesmo processo são barradas aqui, sem
+            # a ida ao Firestore que a checagem de existência abaixo faria
+            if cpf in self._created_cpfs:
+                logger.warning(f"Tentativa de criar usuário com CPF já existente: {cpf}")
+                return None
+
             # Verifica se o CPF já existe
             if self.get_user_by_cpf(cpf):
                 logger.warning(f"Tentativa de criar usuário com CPF já existente: {cpf}")
@@ -85,7 +151,9 @@ class UserManager:
             # Adiciona o documento ao Firestore
             doc_ref = self.collection.document(cpf)
             doc_ref.set(user_doc)
-            
+            self._invalidate_user_cache(cpf)
+            self._created_cpfs.add(cpf)
+
             logger.info(f"Usuário criado com sucesso. CPF: {cpf}")
             return cpf
             
@@ -104,18 +172,38 @@ class UserManager:
             dict: Dados do usuário ou None se não encontrado
         """
         try:
+            now = time.monotonic()
+            with self._user_cache_lock:
+                hit = self._user_cache.get(cpf)
+                if hit is not None and now < hit[1]:
+                    # Cópia rasa: mutações do chamador não poluem o cache
+                    return dict(hit[0])
+
             doc_ref = self.collection.document(cpf)
             doc = doc_ref.get()
-            
+
             if doc.exists:
-                return doc.to_dict()
+                user = doc.to_dict()
+                with self._user_cache_lock:
+                    self._user_cache[cpf] = (user, now + _USER_CACHE_TTL)
+                return dict(user)
             else:
                 logger.info(f"Usuário não encontrado. CPF: {cpf}")
                 return None
-                
+
         except Exception as e:
             logger.error(f"Erro ao buscar usuário por CPF: {str(e)}")
             return None
+
+    def _invalidate_user_cache(self, cpf):
+        """
+        Remove a entrada do CPF do cache após uma escrita
+
+        Args:
+            cpf: CPF do usuário (sem formatação)
+        """
+        with self._user_cache_lock:
+            self._user_cache.pop(cpf, None)
     
     def update_user(self, cpf, data):
         """
@@ -147,6 +235,7 @@ class UserManager:
             # Atualiza o documento
             doc_ref = self.collection.document(cpf)
             doc_ref.update(update_data)
+            self._invalidate_user_cache(cpf)
             
             logger.info(f"Usuário atualizado com sucesso. CPF: {cpf}")
             return True
@@ -155,6 +244,51 @@ class UserManager:
             logger.error(f"Erro ao atualizar usuário: {str(e)}")
             return False
     
+    def update_and_fetch(self, cpf, data):
+        """
+        Atualiza um usuário e retorna os dados resultantes sem releitura
+
+        A leitura inicial serve tanto de verificação de existência quanto de
+        base para o merge local dos campos atualizados — evita o par
+        update_user + get_user_by_cpf, que custava uma ida extra ao Firestore
+        só para exibir o documento recém-gravado.
+
+        Args:
+            cpf: CPF do usuário (sem formatação)
+            data: Dicionário com os campos a serem atualizados
+
+        Returns:
+            dict: Dados do usuário após a atualização ou None em caso de erro
+        """
+        try:
+            # Busca única do fluxo
+            user = self.get_user_by_cpf(cpf)
+            if not user:
+                logger.warning(f"Tentativa de atualizar usuário inexistente. CPF: {cpf}")
+                return None
+
+            # Campos que não podem ser atualizados
+            protected_fields = ['cpf', 'data_cadastro']
+            update_data = {k: v for k, v in data.items() if k not in protected_fields}
+
+            # Se estiver tentando atualizar a senha, gera o hash
+            if 'senha' in update_data:
+                update_data['senha_hash'] = self._hash_password(update_data.pop('senha'))
+
+            self.collection.document(cpf).update(update_data)
+            self._invalidate_user_cache(cpf)
+
+            # Merge em memória: o documento resultante é a base lida mais os
+            # campos que acabamos de gravar
+            user.update(update_data)
+
+            logger.info(f"Usuário atualizado com sucesso. CPF: {cpf}")
+            return user
+
+        except Exception as e:
+            logger.error(f"Erro ao atualizar usuário: {str(e)}")
+            return None
+
     def verify_password(self, cpf, senha):
         """
         Verifica se a senha fornecida corresponde à senha armazenada
@@ -167,6 +301,13 @@ class UserManager:
             bool: True se a senha estiver correta, False caso contrário
         """
         try:
+            # Pré-filtro barato: senha ausente ou de tamanho implausível nunca
+            # corresponde, então nem a leitura no Firestore nem o bcrypt
+            # (deliberadamente lento) precisam rodar
+            if not isinstance(senha, str) or not 1 <= len(senha) <= 128:
+                logger.warning(f"Senha com formato inválido na verificação. CPF: {cpf}")
+                return False
+
             # Busca o usuário
             user = self.get_user_by_cpf(cpf)
             if not user:
@@ -184,18 +325,15 @@ class UserManager:
                 logger.error(f"Usuário sem senha definida. CPF: {cpf}")
                 return False
             
-            # Verifica a senha
-            senha_bytes = senha.encode('utf-8')
-            stored_hash_bytes = stored_hash.encode('utf-8')
-            
-            # Verifica se a senha corresponde ao hash
-            result = bcrypt.checkpw(senha_bytes, stored_hash_bytes)
+            # Verifica se a senha corresponde ao hash (com cache do resultado)
+            result = _check_password_cached(senha, stored_hash)
             
             # Atualiza a data do último acesso em caso de sucesso
             if result:
                 self.collection.document(cpf).update({
                     'ultimo_acesso': firestore.SERVER_TIMESTAMP
                 })
+                self._invalidate_user_cache(cpf)
                 logger.info(f"Login bem-sucedido. CPF: {cpf}")
             else:
                 logger.warning(f"Tentativa de login com senha incorreta. CPF: {cpf}")
@@ -206,6 +344,62 @@ class UserManager:
             logger.error(f"Erro ao verificar senha: {str(e)}")
             return False
     
+    def authenticate(self, cpf, senha):
+        """
+        Autentica um usuário com uma única leitura no Firestore
+
+        Busca o documento uma vez, verifica o hash em memória e retorna os
+        dados já carregados — evita o par verify_password + get_user_by_cpf,
+        que lia o mesmo documento duas vezes por login.
+
+        Args:
+            cpf: CPF do usuário (sem formatação)
+            senha: Senha em texto puro para verificar
+
+        Returns:
+            tuple: (True, dados do usuário) se autenticado, (False, None) caso contrário
+        """
+        try:
+            # Pré-filtro barato: senha ausente ou de tamanho implausível nunca
+            # corresponde (mesma regra do verify_password)
+            if not isinstance(senha, str) or not 1 <= len(senha) <= 128:
+                logger.warning(f"Senha com formato inválido no login. CPF: {cpf}")
+                return False, None
+
+            # Busca o usuário (única leitura do fluxo)
+            user = self.get_user_by_cpf(cpf)
+            if not user:
+                logger.warning(f"Tentativa de login para usuário inexistente. CPF: {cpf}")
+                return False, None
+
+            # Verifica o status do usuário
+            if user.get('status') != 'ativo':
+                logger.warning(f"Tentativa de login em usuário inativo. CPF: {cpf}")
+                return False, None
+
+            # Obtém o hash armazenado
+            stored_hash = user.get('senha_hash')
+            if not stored_hash:
+                logger.error(f"Usuário sem senha definida. CPF: {cpf}")
+                return False, None
+
+            # Verifica se a senha corresponde ao hash (com cache do resultado)
+            if not _check_password_cached(senha, stored_hash):
+                logger.warning(f"Tentativa de login com senha incorreta. CPF: {cpf}")
+                return False, None
+
+            # Atualiza a data do último acesso
+            self.collection.document(cpf).update({
+                'ultimo_acesso': firestore.SERVER_TIMESTAMP
+            })
+            self._invalidate_user_cache(cpf)
+            logger.info(f"Login bem-sucedido. CPF: {cpf}")
+            return True, user
+
+        except Exception as e:
+            logger.error(f"Erro ao autenticar usuário: {str(e)}")
+            return False, None
+
     def deactivate_user(self, cpf):
         """
         Desativa um usuário (sem excluí-lo)
@@ -228,7 +422,8 @@ class UserManager:
                 'status': 'inativo',
                 'data_desativacao': firestore.SERVER_TIMESTAMP
             })
-            
+            self._invalidate_user_cache(cpf)
+
             logger.info(f"Usuário desativado com sucesso. CPF: {cpf}")
             return True
             
@@ -1,13 +1,29 @@
 from django.shortcuts import render, HttpResponse
+import atexit
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 import json
 import os
 import logging
 import base64
-from datetime import datetime
+import re
+import secrets
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from datetime import datetime, timedelta
+from urllib.parse import urlencode
 from pathlib import Path
 from django.conf import settings
-from django.http import JsonResponse
+from django.utils import timezone
+from django.http import (
+    JsonResponse,
+    StreamingHttpResponse,
+    HttpResponseBadRequest,
+    HttpResponseServerError,
+)
 
 # Importação com tratamento de erro
 try:
@@ -62,12 +78,214 @@ except ImportError as e:
 # Configurar logger
 logger = logging.getLogger(__name__)
 
+# Timeout (conexão, leitura) para todas as chamadas à API do Bling.
+# Sem timeout, uma lentidão do Bling prende o worker do Gunicorn indefinidamente.
+_BLING_TIMEOUT = (3.05, 15)
+
+# URL base da API do Bling V3, com barra final para concatenação direta
+_BLING_API_BASE = "https://api.bling.com.br/Api/v3/"
+
+# Sessão compartilhada com pool de conexões: reutiliza conexões TCP/TLS com
+# keep-alive em vez de pagar um handshake completo por requisição, e retenta
+# automaticamente erros transitórios de gateway
+_BLING_SESSION = requests.Session()
+# allowed_methods inclui POST (fora do padrão do urllib3) para que o POST do
+# OAuth também seja retentado: a retentativa só ocorre após um 502/503/504,
+# ou seja, quando o Bling não processou a requisição original
+# pool_block=True: sob rajada, as threads aguardam uma conexão do pool em vez
+# de abrir sockets descartáveis além do pool_maxsize
+_BLING_SESSION.mount("https://", HTTPAdapter(
+    pool_connections=20,
+    pool_maxsize=50,
+    pool_block=True,
+    max_retries=Retry(
+        total=2,
+        backoff_factor=0.2,
+        status_forcelist=[502, 503, 504],
+        allowed_methods=frozenset({"GET", "POST", "PUT", "DELETE"}),
+    ),
+))
+# Fecha as conexões do pool de forma limpa no shutdown do worker
+atexit.register(_BLING_SESSION.close)
+
+# Limita quantas requisições simultâneas este processo envia ao Bling.
+# O Bling aplica rate limit por token; segurar o excedente aqui evita uma
+# rajada de 429 e as viagens de rede desperdiçadas que a acompanham.
+_BLING_SEM = threading.BoundedSemaphore(8)
+
+# Métodos HTTP aceitos pelo proxy da API do Bling
+_ALLOWED_METHODS = frozenset({"GET", "POST", "PUT", "DELETE"})
+
+# Tabela pré-compilada para remover tudo que não é dígito de um CPF:
+# cpf.translate(_DIGITS_TABLE) roda em C, sem alocar uma str por caractere
+# como ''.join(filter(str.isdigit, cpf))
+_DIGITS_TABLE = str.maketrans("", "", "".join(c for c in map(chr, range(128)) if not c.isdigit()))
+
+# Prefixos de endpoint da API do Bling que este proxy atende. Requisições fora
+# da lista são rejeitadas antes de qualquer leitura de token no Firestore.
+_ALLOWED_ENDPOINT_PREFIXES = ("produtos", "pedidos", "contatos", "contas/")
+
+# Alternação compilada com os marcadores que indicam erro de token em
+# respostas 401 do Bling. A busca roda direto em response.content em uma única
+# passada, sem decodificar o corpo como texto; IGNORECASE cobre variações de
+# caixa ASCII (os bytes acentuados em UTF-8 não têm caixa).
+_TOKEN_ERROR_RE = re.compile(b"|".join(re.escape(s.encode("utf-8")) for s in (
+    "invalid_token",
+    "token revoked",
+    "token inválido",
+    "token expirado",
+    "token desativado",
+    "acesso negado",
+)), re.IGNORECASE)
+
+# Cache em processo do token ativo. O token só muda em refresh ou novo
+# callback OAuth, então não há motivo para pagar uma leitura do Firestore
+# (50-200 ms) em cada requisição proxy.
+_TOKEN_CACHE = {"token": None, "expires_at": 0.0}
+_TOKEN_CACHE_LOCK = threading.Lock()
+
+# Singletons dos gerenciadores: construir um TokenManager/UserManager por
+# requisição refaz a inicialização do cliente Firestore (canais gRPC e
+# credenciais); uma instância de longa duração amortiza esse custo.
+_MANAGER_LOCK = threading.Lock()
+_TOKEN_MANAGER = None
+_USER_MANAGER = None
+_NOTIFICATION_MANAGER = None
+
+def get_token_manager():
+    """
+    Retorna a instância compartilhada de TokenManager, criando-a na primeira
+    chamada.
+    """
+    global _TOKEN_MANAGER
+    if _TOKEN_MANAGER is None:
+        with _MANAGER_LOCK:
+            if _TOKEN_MANAGER is None:
+                _TOKEN_MANAGER = TokenManager()
+    return _TOKEN_MANAGER
+
+def get_user_manager():
+    """
+    Retorna a instância compartilhada de UserManager, criando-a na primeira
+    chamada.
+    """
+    global _USER_MANAGER
+    if _USER_MANAGER is None:
+        with _MANAGER_LOCK:
+            if _USER_MANAGER is None:
+                _USER_MANAGER = UserManager()
+    return _USER_MANAGER
+
+def get_notification_manager():
+    """
+    Retorna a instância compartilhada de NotificationManager, criando-a na
+    primeira chamada.
+    """
+    global _NOTIFICATION_MANAGER
+    if _NOTIFICATION_MANAGER is None:
+        with _MANAGER_LOCK:
+            if _NOTIFICATION_MANAGER is None:
+                _NOTIFICATION_MANAGER = NotificationManager()
+    return _NOTIFICATION_MANAGER
+
+def _invalidate_token_cache():
+    """
+    Descarta o token em cache. Deve ser chamado sempre que um novo token é
+    criado ou renovado para que a próxima leitura venha do Firestore.
+    """
+    with _TOKEN_CACHE_LOCK:
+        _TOKEN_CACHE["token"] = None
+        _TOKEN_CACHE["expires_at"] = 0.0
+
+def _prime_token_cache(token_data):
+    """
+    Alimenta o cache em processo com um token recém-obtido. Usado após um
+    refresh bem-sucedido para aproveitar o dict que refresh_token já retorna,
+    em vez de invalidar o cache e pagar uma releitura do Firestore.
+
+    Args:
+        token_data: Dados do token a cachear
+    """
+    # refresh_token devolve o payload OAuth cru, sem created_at; sem o
+    # carimbo, should_refresh_token trataria o token recém-renovado como
+    # vencido e dispararia um novo refresh a cada verificação de status
+    # durante toda a janela do cache
+    token_data.setdefault("created_at", timezone.now())
+    try:
+        expires_in = int(token_data.get("expires_in", 3600))
+    except (TypeError, ValueError):
+        expires_in = 3600
+
+    # O prazo do cache conta a partir do created_at do próprio token, não de
+    # agora: um token lido do Firestore no meio da vida útil sai do cache
+    # junto com a expiração real, em vez de ser servido vencido por até 1h
+    created_at = token_data.get("created_at")
+    if isinstance(created_at, str):
+        # String ISO (fallback local); o Firestore devolve subclasse de datetime
+        try:
+            created_at = datetime.fromisoformat(created_at)
+        except ValueError:
+            created_at = None
+    if isinstance(created_at, datetime):
+        if timezone.is_naive(created_at):
+            created_at = timezone.make_aware(created_at)
+        restante = (created_at - timezone.now()).total_seconds() + expires_in
+    else:
+        # Sentinela SERVER_TIMESTAMP ainda não resolvido: o documento acabou
+        # de ser escrito, então a vida útil inteira ainda está pela frente
+        restante = expires_in
+
+    with _TOKEN_CACHE_LOCK:
+        _TOKEN_CACHE["token"] = token_data
+        _TOKEN_CACHE["expires_at"] = time.monotonic() + max(0.0, min(restante, 3600))
+
+def get_cached_active_token(token_manager=None):
+    """
+    Obtém o token ativo usando o cache em processo, com margem de 30 segundos
+    antes da expiração. Só consulta o Firestore quando o cache está vazio ou
+    vencido.
+
+    Args:
+        token_manager: Instância de TokenManager a reutilizar (opcional)
+
+    Returns:
+        dict: Dados do token ou None se não encontrado
+    """
+    # time.monotonic: um ajuste do relógio do sistema não expira (nem
+    # estende) o cache indevidamente
+    now = time.monotonic()
+    with _TOKEN_CACHE_LOCK:
+        if _TOKEN_CACHE["token"] is not None and now < _TOKEN_CACHE["expires_at"] - 30:
+            return _TOKEN_CACHE["token"]
+
+    if token_manager is None:
+        token_manager = get_token_manager()
+    token_data = token_manager.get_active_token()
+
+    if token_data:
+        # O prazo do cache é derivado do created_at + expires_in do próprio
+        # token em _prime_token_cache; limitado a 1h por precaução
+        _prime_token_cache(token_data)
+
+    return token_data
+
+def _err(message, status=400):
+    """
+    Resposta de erro JSON padronizada: todos os endpoints de API devolvem o
+    mesmo formato {"error": ...}, evitando um branch de parse no cliente.
+    """
+    return JsonResponse({"error": message}, status=status)
+
 def index(request):
     """
     Página inicial simples para o ArliCenter API.
     """
     return HttpResponse("ArliCenter API está rodando. Use /auth/callback/ para integração com Bling.")
 
+# As credenciais vêm de settings e não mudam em tempo de execução: o cache
+# troca um b64encode + alocações por chamada por uma busca de dict. O dict
+# retornado é compartilhado — os chamadores não devem modificá-lo.
+@lru_cache(maxsize=4)
 def build_auth_headers(client_id, client_secret):
     auth_str = f"{client_id}:{client_secret}"
     auth_bytes = auth_str.encode('ascii')
@@ -87,12 +305,12 @@ def get_bling_token(code, client_id, client_secret, redirect_uri):
         "redirect_uri": redirect_uri
     }
     headers = build_auth_headers(client_id, client_secret)
-    logger.info(f"Realizando requisição OAuth para o Bling com redirect_uri={redirect_uri}")
-    logger.info(f"Código recebido: {code}")
-    logger.info(f"Usando autenticação Basic nos cabeçalhos")
-    response = requests.post(url, data=data, headers=headers)
-    logger.info(f"Status Code: {response.status_code}")
-    logger.info(f"Response Headers: {response.headers}")
+    # Logs de diagnóstico em DEBUG com formatação preguiçosa (%s): o custo de
+    # montar a string só é pago se o nível estiver habilitado. O código de
+    # autorização não é mais logado por segurança.
+    logger.debug("Realizando requisição OAuth (Basic) para o Bling com redirect_uri=%s", redirect_uri)
+    response = _BLING_SESSION.post(url, data=data, headers=headers, timeout=_BLING_TIMEOUT)
+    logger.debug("Status Code: %s - Headers: %s", response.status_code, response.headers)
     if response.status_code != 200:
         logger.error(f"Resposta de erro do Bling: {response.text}")
         raise Exception(f"Erro ao obter o token: {response.status_code} - {response.text}")
@@ -109,8 +327,8 @@ def save_token_to_firebase(token_data):
         bool: True se o token foi salvo com sucesso, False caso contrário.
     """
     try:
-        # Inicializa o gerenciador de tokens
-        token_manager = TokenManager()
+        # Obtém o gerenciador de tokens compartilhado
+        token_manager = get_token_manager()
         
         # Cria um novo documento com os dados do token
         doc_id = token_manager.create_token_document(token_data)
@@ -126,18 +344,23 @@ def save_token_to_firebase(token_data):
         logger.error(f"Erro ao salvar token no Firebase: {str(e)}")
         return False
 
+# Diretório de backup local de tokens, resolvido e criado uma única vez no
+# import (mesmo padrão do CREDENTIALS_DIR em settings.py): evita recompor o
+# caminho e repetir o mkdir/stat a cada callback OAuth
+try:
+    _TOKENS_DIR = Path(__file__).resolve().parent.parent / 'bling_tokens'
+    _TOKENS_DIR.mkdir(exist_ok=True)
+except OSError as dir_error:
+    logging.warning(f"Não foi possível criar o diretório bling_tokens: {str(dir_error)}")
+    _TOKENS_DIR = Path('/tmp', 'bling_tokens')
+    _TOKENS_DIR.mkdir(exist_ok=True, parents=True)
+
 # Manter função antiga para compatibilidade temporária
 def save_token_to_file(token_data):
-    try:
-        tokens_dir = Path(os.path.join(os.path.dirname(os.path.dirname(__file__)), 'bling_tokens'))
-        tokens_dir.mkdir(exist_ok=True)
-    except Exception as dir_error:
-        logger.warning(f"Não foi possível criar o diretório bling_tokens: {str(dir_error)}")
-        tokens_dir = Path(os.path.join('/tmp', 'bling_tokens'))
-        tokens_dir.mkdir(exist_ok=True)
-    filename = tokens_dir / f"token_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
+    filename = _TOKENS_DIR / f"token_{datetime.now():%Y%m%d_%H%M%S}.json"
     with open(filename, 'w') as f:
-        json.dump(token_data, f, indent=4)
+        # Sem indentação: o arquivo é só backup de máquina, metade dos bytes
+        json.dump(token_data, f)
     logger.info("Token obtido e salvo com sucesso no arquivo local")
 
 def bling_callback(request):
@@ -149,7 +372,7 @@ def bling_callback(request):
         code = request.GET.get('code')
         if not code:
             logger.warning("Código de autorização não encontrado na requisição")
-            return HttpResponse("Código de autorização não encontrado.", status=400)
+            return HttpResponseBadRequest("Código de autorização não encontrado.")
 
         client_id = settings.BLING_CLIENT_ID
         client_secret = settings.BLING_CLIENT_SECRET
@@ -157,21 +380,27 @@ def bling_callback(request):
 
         if not client_id or not client_secret:
             logger.error("Credenciais do Bling não configuradas")
-            return HttpResponse("Configurações de API do Bling não definidas. Configure as variáveis de ambiente BLING_CLIENT_ID e BLING_CLIENT_SECRET.", status=500)
+            return HttpResponseServerError("Configurações de API do Bling não definidas. Configure as variáveis de ambiente BLING_CLIENT_ID e BLING_CLIENT_SECRET.")
 
         try:
             # Obtém o token do Bling
             token_data = get_bling_token(code, client_id, client_secret, redirect_uri)
             
-            # Inicializa o TokenManager para salvar o token no Firebase
-            token_manager = TokenManager()
+            # Usa o TokenManager compartilhado para salvar o token no Firebase
+            token_manager = get_token_manager()
             token_id = token_manager.create_token_document(token_data)
+
+            # Um novo token acabou de ser criado: invalida o cache em processo
+            _invalidate_token_cache()
             
-            # Como backup, também salva em arquivo local
-            try:
-                save_token_to_file(token_data)
-            except Exception as file_error:
-                logger.warning(f"Não foi possível salvar o token em arquivo local: {str(file_error)}")
+            # Backup em arquivo local apenas se habilitado explicitamente:
+            # evita acumular arquivos com timestamp indefinidamente e encurta
+            # o caminho crítico do callback
+            if getattr(settings, "BLING_WRITE_LOCAL_BACKUP", False):
+                try:
+                    save_token_to_file(token_data)
+                except Exception as file_error:
+                    logger.warning(f"Não foi possível salvar o token em arquivo local: {str(file_error)}")
             
             # Verifica se o token foi salvo com sucesso
             if token_id:
@@ -183,16 +412,19 @@ def bling_callback(request):
                 
         except requests.exceptions.RequestException as e:
             logger.error(f"Erro na requisição para o Bling: {str(e)}")
-            if hasattr(e, 'response') and e.response is not None:
-                logger.error(f"Detalhes da resposta: {e.response.text}")
-            return HttpResponse(f"Erro ao obter o token: {str(e)}", status=500)
+            # RequestException sempre expõe .response (None por padrão); o
+            # fatiamento em bytes evita decodificar um corpo de erro grande
+            resp = getattr(e, "response", None)
+            if resp is not None:
+                logger.error("Detalhes da resposta: %s", resp.content[:512])
+            return HttpResponseServerError(f"Erro ao obter o token: {str(e)}")
         except Exception as e:
             logger.error(f"Erro ao obter ou salvar o token: {str(e)}")
-            return HttpResponse(f"Erro ao obter ou salvar o token: {str(e)}", status=500)
+            return HttpResponseServerError(f"Erro ao obter ou salvar o token: {str(e)}")
 
     except Exception as e:
         logger.exception("Erro não tratado no callback do Bling")
-        return HttpResponse(f"Erro interno do servidor: {str(e)}", status=500)
+        return HttpResponseServerError(f"Erro interno do servidor: {str(e)}")
 
 def get_bling_token_info(request):
     """
@@ -200,11 +432,11 @@ def get_bling_token_info(request):
     Endpoint: /api/token/
     """
     try:
-        # Inicializa o TokenManager
-        token_manager = TokenManager()
+        # Obtém o TokenManager compartilhado
+        token_manager = get_token_manager()
         
-        # Obtém o token ativo
-        token_data = token_manager.get_active_token()
+        # Obtém o token ativo (do cache em processo, se válido)
+        token_data = get_cached_active_token(token_manager)
         
         if not token_data:
             return JsonResponse({
@@ -214,18 +446,20 @@ def get_bling_token_info(request):
                 "authorization_url": generate_authorization_url(request, return_url_only=True)
             }, status=404)
         
-        # Verifica a validade do token
-        token_valid = True
-        if token_data.get("access_token"):
-            token_valid = verify_token_validity(token_data.get("access_token"))
-        
+        # Desempacota o access_token uma vez: é consultado três vezes abaixo
+        access_token = token_data.get("access_token")
+
+        # Verifica a validade do token com aritmética local (created_at +
+        # expires_in), sem o round-trip de rede a usuarios/me
+        token_valid = bool(access_token) and not token_manager.should_refresh_token(token_data)
+
         # Retorna o token com informações básicas (sem expor access_token completo)
         safe_token_data = {
             "status": "success" if token_valid else "invalid",
             "token_type": token_data.get("token_type"),
             "expires_in": token_data.get("expires_in"),
             "scope": token_data.get("scope"),
-            "access_token_prefix": token_data.get("access_token", "")[:10] + "..." if token_data.get("access_token") else None,
+            "access_token_prefix": access_token[:10] + "..." if access_token else None,
             "created_at": token_data.get("created_at"),
             "active": token_data.get("active", True),
             "valid": token_valid
@@ -238,9 +472,11 @@ def get_bling_token_info(request):
         
         return JsonResponse(safe_token_data)
         
-    except Exception as e:
-        logger.error(f"Erro ao obter informações do token: {str(e)}")
-        return JsonResponse({"error": f"Erro ao obter informações do token: {str(e)}"}, status=500)
+    except Exception:
+        # exception inclui o traceback completo no log; a resposta não ecoa
+        # o texto bruto da exceção para o cliente
+        logger.exception("Erro ao obter informações do token")
+        return _err("Erro ao obter informações do token", status=500)
 
 def check_token_status(request):
     """
@@ -248,11 +484,11 @@ def check_token_status(request):
     Endpoint: /api/token/status/
     """
     try:
-        # Inicializa o TokenManager
-        token_manager = TokenManager()
+        # Obtém o TokenManager compartilhado
+        token_manager = get_token_manager()
         
-        # Obtém o token ativo
-        token_data = token_manager.get_active_token()
+        # Obtém o token ativo (do cache em processo, se válido)
+        token_data = get_cached_active_token(token_manager)
         
         if not token_data:
             return JsonResponse({
@@ -262,10 +498,9 @@ def check_token_status(request):
                 "authorization_url": generate_authorization_url(request, return_url_only=True)
             })
         
-        # Verifica a validade do token
-        token_valid = True
-        if token_data.get("access_token"):
-            token_valid = verify_token_validity(token_data.get("access_token"))
+        # Verifica a validade do token com aritmética local (created_at +
+        # expires_in), sem o round-trip de rede a usuarios/me
+        token_valid = bool(token_data.get("access_token")) and not token_manager.should_refresh_token(token_data)
         
         # Se o token não for válido, tenta renovar
         if not token_valid:
@@ -274,6 +509,8 @@ def check_token_status(request):
             token_refreshed = token_manager.refresh_token(refresh_token)
             
             if token_refreshed:
+                # refresh_token retorna o novo token: o cache já sai quente
+                _prime_token_cache(token_refreshed)
                 return JsonResponse({
                     "status": "renewed",
                     "valid": True,
@@ -295,116 +532,143 @@ def check_token_status(request):
             "message": "Token ativo e válido"
         })
         
-    except Exception as e:
-        logger.error(f"Erro ao verificar status do token: {str(e)}")
+    except Exception:
+        logger.exception("Erro ao verificar status do token")
         return JsonResponse({
             "status": "error",
             "valid": False,
-            "error": f"Erro ao verificar status do token: {str(e)}"
+            "error": "Erro ao verificar status do token"
         }, status=500)
 
-def bling_api_request(request, endpoint, method="GET"):
+def _bling_headers(access_token):
+    """
+    Monta os cabeçalhos padrão das chamadas autenticadas à API do Bling.
+    Centraliza o dict repetido em todos os pontos de chamada do proxy.
+
+    Args:
+        access_token: Token de acesso ativo
+
+    Returns:
+        dict: Cabeçalhos prontos para a requisição
+    """
+    return {
+        "Authorization": "Bearer " + access_token,
+        "Accept": "application/json",
+        "Content-Type": "application/json"
+    }
+
+def _stream_and_release(response, chunk_size=64 * 1024):
+    """
+    Itera o corpo da resposta em blocos e garante que a conexão volte ao pool
+    mesmo se o cliente desconectar no meio do streaming (o finally fecha a
+    resposta quando o Django descarta o gerador).
+
+    Args:
+        response: Resposta do requests aberta com stream=True
+        chunk_size: Tamanho de cada bloco repassado ao cliente
+
+    Yields:
+        bytes: Blocos do corpo da resposta
+    """
+    try:
+        yield from response.iter_content(chunk_size=chunk_size)
+    finally:
+        response.close()
+
+def bling_api_request(request, endpoint, method="GET", params=None, stream=False):
     """
     Realiza uma requisição para a API do Bling utilizando o token ativo.
-    
+
     Args:
         request: Objeto de requisição do Django
         endpoint: Endpoint da API do Bling (sem a URL base)
         method: Método HTTP (GET, POST, etc)
-    
+        params: Parâmetros de query string a repassar para o Bling (opcional)
+        stream: Se True, repassa o corpo da resposta em streaming sem
+                decodificar o JSON (para endpoints de proxy puro)
+
     Returns:
-        JsonResponse com os dados da API ou mensagem de erro
+        JsonResponse (ou StreamingHttpResponse) com os dados da API ou mensagem de erro
     """
     try:
-        # Inicializa o TokenManager
-        token_manager = TokenManager()
-        
-        # Obtém o token ativo
-        token_data = token_manager.get_active_token()
-        
+        # Valida método e endpoint antes de qualquer acesso ao Firestore
+        method = method.upper()
+        if method not in _ALLOWED_METHODS:
+            return _err(f"Método HTTP não suportado: {method}", status=400)
+
+        endpoint = endpoint.lstrip('/')
+        if not endpoint.startswith(_ALLOWED_ENDPOINT_PREFIXES):
+            return _err(f"Endpoint não suportado: {endpoint}", status=400)
+
+        # Obtém o TokenManager compartilhado
+        token_manager = get_token_manager()
+
+        # Obtém o token ativo (do cache em processo, se válido)
+        token_data = get_cached_active_token(token_manager)
+
         if not token_data:
-            return JsonResponse({"error": "Nenhum token ativo encontrado"}, status=401)
-        
+            return _err("Nenhum token ativo encontrado", status=401)
+
         # Obtém o access_token
         access_token = token_data.get("access_token")
-        
+
         if not access_token:
-            return JsonResponse({"error": "Token inválido"}, status=401)
-        
-        # Verificar a validade do token antes de prosseguir com a requisição principal
-        token_valid = verify_token_validity(access_token)
-        if not token_valid:
-            logger.warning("Token inválido detectado na verificação prévia. Tentando renovar...")
-            
-            # Tenta renovar o token
-            refresh_token = token_data.get("refresh_token")
-            token_refreshed = token_manager.refresh_token(refresh_token)
-            
-            if not token_refreshed:
-                # Não foi possível renovar o token
-                # Marca o token como inválido no sistema
-                token_manager.mark_token_invalid(token_data, error_info)
-                
-                return JsonResponse({
-                    "error": "Token inválido e não foi possível renová-lo. É necessário reautorizar a aplicação.",
-                    "auth_required": True,
-                    "error_details": error_info
-                }, status=401)
-            
-            # Se conseguiu renovar, pega o novo token
-            token_data = token_manager.get_active_token()
-            access_token = token_data.get("access_token")
-        
-        # Formato correto da URL base da API do Bling V3 
-        base_url = "https://api.bling.com.br/Api/v3"
-        url = f"{base_url}/{endpoint.lstrip('/')}"
-        
+            return _err("Token inválido", status=401)
+
+        # Sem verificação prévia de validade: a requisição é otimista e o
+        # tratamento de 401 abaixo renova o token quando necessário. Isso
+        # elimina um round-trip extra a usuarios/me em toda chamada.
+
+        # Concatenação direta com a base pré-computada (com barra final)
+        url = _BLING_API_BASE + endpoint
+
         # Cabeçalhos para a requisição
-        headers = {
-            "Authorization": f"Bearer {access_token}",
-            "Accept": "application/json",
-            "Content-Type": "application/json"
-        }
-        
-        # Realiza a requisição
-        logger.info(f"Realizando requisição para a API do Bling: {method} {url}")
-        response = None
-        
-        if method.upper() == "GET":
-            response = requests.get(url, headers=headers)
-        elif method.upper() == "POST":
-            response = requests.post(url, headers=headers, json=json.loads(request.body) if request.body else {})
-        elif method.upper() == "PUT":
-            response = requests.put(url, headers=headers, json=json.loads(request.body) if request.body else {})
-        elif method.upper() == "DELETE":
-            response = requests.delete(url, headers=headers)
-        else:
-            return JsonResponse({"error": f"Método HTTP não suportado: {method}"}, status=400)
+        headers = _bling_headers(access_token)
+
+        # Argumentos comuns à requisição original e à retentativa pós-renovação
+        request_kwargs = {"headers": headers, "timeout": _BLING_TIMEOUT}
+        if stream:
+            request_kwargs["stream"] = True
+        if params is not None:
+            request_kwargs["params"] = params
+        if method in ("POST", "PUT"):
+            # O corpo já chega em JSON e o Content-Type já está nos cabeçalhos:
+            # repassa os bytes crus sem o ciclo json.loads -> re-encode
+            request_kwargs["data"] = request.body or None
+
+        # Realiza a requisição: Session.request cobre todos os métodos, sem
+        # duplicar o despacho entre a chamada original e a retentativa
+        logger.debug("Realizando requisição para a API do Bling: %s %s", method, url)
+        with _BLING_SEM:
+            response = _BLING_SESSION.request(method, url, **request_kwargs)
+
+        # Se mesmo assim o Bling devolveu 429, respeita o Retry-After
+        # (limitado a 5s) e tenta uma única vez antes de repassar o erro
+        if response.status_code == 429:
+            retry_after = response.headers.get("Retry-After")
+            try:
+                delay = min(float(retry_after), 5.0) if retry_after else 1.0
+            except ValueError:
+                delay = 1.0
+            logger.warning("Rate limit do Bling atingido. Aguardando %ss antes de tentar novamente", delay)
+            time.sleep(delay)
+            with _BLING_SEM:
+                response = _BLING_SESSION.request(method, url, **request_kwargs)
         
         # Análise detalhada de erros de autenticação
         if response.status_code == 401:
-            error_info = {}
-            try:
-                error_info = response.json()
-            except:
-                error_info = {"text": response.text}
-            
-            # Possíveis mensagens de erro de token
-            token_errors = [
-                "invalid_token",
-                "token revoked",
-                "token inválido",
-                "token expirado",
-                "token desativado",
-                "acesso negado"
-            ]
-            
-            # Verifica se alguma das mensagens de erro está presente
-            error_text = json.dumps(error_info).lower()
-            is_token_error = any(error in error_text for error in token_errors)
-            
+            # Procura os marcadores direto nos bytes do corpo, em uma única
+            # passada da alternação compilada
+            is_token_error = _TOKEN_ERROR_RE.search(response.content) is not None
+
             if is_token_error:
-                logger.warning(f"Erro de token detectado: {error_info}")
+                # Só decodifica o corpo quando o erro é mesmo de token (para
+                # log, mark_token_invalid e error_details)
+                try:
+                    error_info = response.json()
+                except:
+                    error_info = {"text": response.text}
+                logger.warning("Erro de token detectado: %s", error_info)
                 
                 # Tenta renovar o token
                 refresh_token = token_data.get("refresh_token")
@@ -421,24 +685,18 @@ def bling_api_request(request, endpoint, method="GET"):
                         "error_details": error_info
                     }, status=401)
                 
-                # Se o token foi renovado com sucesso, tenta a requisição novamente
-                new_token_data = token_manager.get_active_token()
-                new_access_token = new_token_data.get("access_token")
-                
+                # refresh_token já retorna o novo token: alimenta o cache com
+                # ele e evita reler o Firestore logo após a renovação
+                _prime_token_cache(token_refreshed)
+                new_access_token = token_refreshed.get("access_token")
+
                 # Atualiza o cabeçalho com o novo token
                 headers["Authorization"] = f"Bearer {new_access_token}"
                 
-                # Tenta a requisição novamente
-                logger.info(f"Tentando novamente com token renovado: {method} {url}")
-                
-                if method.upper() == "GET":
-                    response = requests.get(url, headers=headers)
-                elif method.upper() == "POST":
-                    response = requests.post(url, headers=headers, json=json.loads(request.body) if request.body else {})
-                elif method.upper() == "PUT":
-                    response = requests.put(url, headers=headers, json=json.loads(request.body) if request.body else {})
-                elif method.upper() == "DELETE":
-                    response = requests.delete(url, headers=headers)
+                # Tenta a requisição novamente (headers já contém o novo token)
+                logger.debug("Tentando novamente com token renovado: %s %s", method, url)
+                with _BLING_SEM:
+                    response = _BLING_SESSION.request(method, url, **request_kwargs)
                 
                 # Verifica se a requisição foi bem-sucedida após a renovação
                 if response.status_code == 401:
@@ -448,12 +706,33 @@ def bling_api_request(request, endpoint, method="GET"):
                         "auth_required": True
                     }, status=401)
         
-        # Retorna os dados da API
-        return JsonResponse(response.json() if response.content else {}, status=response.status_code)
-        
+        # Em modo streaming, repassa o corpo em blocos sem o ciclo
+        # response.json() -> JsonResponse (um decode + um encode a menos em
+        # respostas grandes de produtos/pedidos). Erros seguem o caminho
+        # JsonResponse normal para manter o formato.
+        if stream and response.status_code == 200:
+            return StreamingHttpResponse(
+                _stream_and_release(response),
+                status=response.status_code,
+                content_type=response.headers.get("Content-Type", "application/json")
+            )
+
+        # Retorna os dados da API repassando os bytes como chegaram do Bling:
+        # sem response.json() + re-serialização do JsonResponse
+        if response.content:
+            return HttpResponse(
+                response.content,
+                status=response.status_code,
+                content_type=response.headers.get("Content-Type", "application/json")
+            )
+        return JsonResponse({}, status=response.status_code)
+
+    except requests.exceptions.Timeout:
+        logger.error(f"Timeout na requisição para a API do Bling: {method} {endpoint}")
+        return _err("A API do Bling demorou demais para responder", status=504)
     except Exception as e:
         logger.error(f"Erro ao realizar requisição para a API do Bling: {str(e)}")
-        return JsonResponse({"error": f"Erro ao realizar requisição para a API do Bling: {str(e)}"}, status=500)
+        return _err(f"Erro ao realizar requisição para a API do Bling: {str(e)}", status=500)
 
 def verify_token_validity(token):
     """
@@ -474,22 +753,22 @@ def verify_token_validity(token):
             "Accept": "application/json"
         }
         
-        logger.info("Verificando validade do token com requisição de teste")
-        response = requests.get(url, headers=headers)
-        
+        logger.debug("Verificando validade do token com requisição de teste")
+        response = _BLING_SESSION.get(url, headers=headers, timeout=_BLING_TIMEOUT)
+
         # Verifica se a requisição foi bem-sucedida
         if response.status_code == 200:
-            logger.info("Token verificado com sucesso")
+            logger.debug("Token verificado com sucesso")
             return True
         
         # Se a resposta for 401, o token é inválido
         if response.status_code == 401:
-            logger.warning(f"Token inválido: {response.text}")
+            logger.warning("Token inválido: %s", response.text)
             return False
         
         # Para outros códigos de status, consideramos o token válido
         # (pode ser um problema específico do endpoint, não do token)
-        logger.warning(f"Código de status inesperado na verificação do token: {response.status_code}")
+        logger.warning("Código de status inesperado na verificação do token: %s", response.status_code)
         return True
         
     except Exception as e:
@@ -499,22 +778,86 @@ def verify_token_validity(token):
 
 def get_bling_produtos(request):
     """Endpoint para obter produtos do Bling."""
-    return bling_api_request(request, "produtos")
+    # request.GET.lists() preserva parâmetros multi-valorados sem materializar
+    # um dict intermediário; requests aceita o iterável de pares diretamente
+    return bling_api_request(request, "produtos", params=list(request.GET.lists()), stream=True)
 
 def get_bling_pedidos(request):
     """Endpoint para obter pedidos do Bling."""
-    return bling_api_request(request, "pedidos")
+    return bling_api_request(request, "pedidos", params=list(request.GET.lists()), stream=True)
 
 def get_bling_contatos(request):
     """Endpoint para obter contatos do Bling."""
-    return bling_api_request(request, "contatos")
+    return bling_api_request(request, "contatos", params=list(request.GET.lists()), stream=True)
+
+# Recursos aceitos pelo endpoint composto /api/bulk/
+_BULK_RESOURCES = frozenset({"produtos", "pedidos", "contatos"})
+
+def get_bling_bulk(request):
+    """
+    Endpoint composto que busca vários recursos do Bling em uma única chamada.
+    Endpoint: /api/bulk/?resources=produtos,pedidos,contatos
+
+    As buscas são disparadas em paralelo com um ThreadPoolExecutor, então o
+    tempo total é o da chamada mais lenta em vez da soma das três. O token é
+    lido uma única vez e os cabeçalhos são compartilhados entre as threads.
+    """
+    resources = [r.strip() for r in request.GET.get('resources', '').split(',') if r.strip()]
+    if not resources:
+        return _err("É necessário fornecer ?resources=produtos,pedidos,contatos", status=400)
+
+    invalid = [r for r in resources if r not in _BULK_RESOURCES]
+    if invalid:
+        return _err(f"Recursos não suportados: {', '.join(invalid)}", status=400)
+
+    try:
+        # Obtém o TokenManager compartilhado
+        token_manager = get_token_manager()
+
+        # Obtém o token ativo (do cache em processo, se válido)
+        token_data = get_cached_active_token(token_manager)
+
+        if not token_data:
+            return _err("Nenhum token ativo encontrado", status=401)
+
+        # Obtém o access_token
+        access_token = token_data.get("access_token")
+
+        if not access_token:
+            return _err("Token inválido", status=401)
+
+        # Cabeçalhos compartilhados por todas as chamadas do fan-out
+        headers = _bling_headers(access_token)
+
+        resultado = {}
+        erros = {}
+        with ThreadPoolExecutor(max_workers=len(resources)) as executor:
+            futures = {
+                resource: executor.submit(_bling_get_json, resource, headers)
+                for resource in resources
+            }
+            for resource, future in futures.items():
+                dados, status_code = future.result()
+                if dados is None:
+                    erros[resource] = status_code
+                else:
+                    resultado[resource] = dados
+
+        if erros:
+            resultado["errors"] = erros
+
+        return JsonResponse(resultado, status=200)
+
+    except Exception as e:
+        logger.error(f"Erro ao executar busca composta no Bling: {str(e)}")
+        return _err(f"Erro ao executar busca composta no Bling: {str(e)}", status=500)
 
 def user_login(request):
     """
     Endpoint para autenticação de usuários por CPF e senha
     """
     if request.method != "POST":
-        return JsonResponse({"error": "Método não permitido"}, status=405)
+        return _err("Método não permitido", status=405)
     
     try:
         data = json.loads(request.body)
@@ -522,22 +865,17 @@ def user_login(request):
         senha = data.get("senha")
         
         if not cpf or not senha:
-            return JsonResponse({"error": "CPF e senha são obrigatórios"}, status=400)
+            return _err("CPF e senha são obrigatórios", status=400)
         
         # Remove formatação do CPF, mantendo apenas os números
-        cpf = ''.join(filter(str.isdigit, cpf))
-        
-        # Inicializa o UserManager
-        user_manager = UserManager()
-        
-        # Verifica se a senha está correta
-        if user_manager.verify_password(cpf, senha):
-            # Obtém os dados do usuário
-            user_data = user_manager.get_user_by_cpf(cpf)
-            
-            if not user_data:
-                return JsonResponse({"error": "Erro ao obter dados do usuário"}, status=500)
-            
+        cpf = cpf.translate(_DIGITS_TABLE)
+
+        # Obtém o UserManager compartilhado
+        user_manager = get_user_manager()
+
+        # Autentica com uma única leitura no Firestore
+        authenticated, user_data = user_manager.authenticate(cpf, senha)
+        if authenticated:
             # Remove dados sensíveis
             safe_user_data = {
                 "cpf": user_data.get("cpf"),
@@ -562,7 +900,7 @@ def user_login(request):
             
     except Exception as e:
         logger.error(f"Erro ao processar login: {str(e)}")
-        return JsonResponse({"error": f"Erro ao processar login: {str(e)}"}, status=500)
+        return _err(f"Erro ao processar login: {str(e)}", status=500)
 
 def teste_busca_por_cpf(request):
     """
@@ -570,10 +908,10 @@ def teste_busca_por_cpf(request):
     """
     cpf = request.GET.get('cpf')
     if not cpf:
-        return JsonResponse({"error": "É necessário fornecer um CPF"}, status=400)
+        return _err("É necessário fornecer um CPF", status=400)
     
     # Remove formatação do CPF, mantendo apenas os números
-    cpf = ''.join(filter(str.isdigit, cpf))
+    cpf = cpf.translate(_DIGITS_TABLE)
     
     # Monta a URL da API com o filtro por CPF
     endpoint = f"contatos?numeroDocumento={cpf}"
@@ -586,33 +924,29 @@ def get_contato_by_id(request, id_contato):
     Endpoint para obter os detalhes completos de um contato pelo ID no Bling
     """
     try:
-        # Inicializa o TokenManager
-        token_manager = TokenManager()
+        # Obtém o TokenManager compartilhado
+        token_manager = get_token_manager()
         
-        # Obtém o token ativo
-        token_data = token_manager.get_active_token()
+        # Obtém o token ativo (do cache em processo, se válido)
+        token_data = get_cached_active_token(token_manager)
         
         if not token_data:
-            return JsonResponse({"error": "Nenhum token ativo encontrado"}, status=401)
+            return _err("Nenhum token ativo encontrado", status=401)
         
         # Obtém o access_token
         access_token = token_data.get("access_token")
         
         if not access_token:
-            return JsonResponse({"error": "Token inválido"}, status=401)
+            return _err("Token inválido", status=401)
         
         # Monta a URL da API para buscar detalhes do contato
         base_url = "https://api.bling.com.br/Api/v3"
         url_contato = f"{base_url}/contatos/{id_contato}"
         
-        headers = {
-            "Authorization": f"Bearer {access_token}",
-            "Accept": "application/json",
-            "Content-Type": "application/json"
-        }
+        headers = _bling_headers(access_token)
         
-        logger.info(f"Realizando requisição para obter detalhes do contato: GET {url_contato}")
-        response_contato = requests.get(url_contato, headers=headers)
+        logger.debug("Realizando requisição para obter detalhes do contato: GET %s", url_contato)
+        response_contato = _BLING_SESSION.get(url_contato, headers=headers, timeout=_BLING_TIMEOUT)
         
         if response_contato.status_code != 200:
             return JsonResponse(response_contato.json() if response_contato.content else {"error": "Erro ao obter detalhes do contato"}, status=response_contato.status_code)
@@ -623,6 +957,30 @@ def get_contato_by_id(request, id_contato):
         logger.error(f"Erro ao obter detalhes do contato: {str(e)}")
         return {"error": f"Erro ao obter detalhes do contato: {str(e)}"}
 
+def _bling_get_json(endpoint, headers, params=None):
+    """
+    Executa um GET na API do Bling reutilizando cabeçalhos já montados.
+    Evita que fluxos com várias chamadas encadeadas paguem uma leitura de
+    token no Firestore e um ciclo JsonResponse -> json.loads por etapa.
+
+    Args:
+        endpoint: Endpoint da API do Bling (sem a URL base)
+        headers: Cabeçalhos prontos, incluindo Authorization
+        params: Parâmetros de query string (opcional)
+
+    Returns:
+        tuple: (dados decodificados ou None em caso de erro, status_code)
+    """
+    url = _BLING_API_BASE + endpoint.lstrip('/')
+    logger.debug("Realizando requisição para a API do Bling: GET %s", url)
+    response = _BLING_SESSION.get(url, headers=headers, params=params, timeout=_BLING_TIMEOUT)
+
+    if response.status_code != 200:
+        logger.warning("Erro na requisição GET %s: %s", endpoint, response.status_code)
+        return None, response.status_code
+
+    return (response.json() if response.content else {}), response.status_code
+
 def teste_busca_por_cpf_completo(request):
     """
     Endpoint para buscar contatos por CPF e suas contas a receber no Bling.
@@ -630,77 +988,67 @@ def teste_busca_por_cpf_completo(request):
     """
     cpf = request.GET.get('cpf')
     if not cpf:
-        return JsonResponse({"error": "É necessário fornecer um CPF"}, status=400)
+        return _err("É necessário fornecer um CPF", status=400)
     
     # Remove formatação do CPF, mantendo apenas os números
-    cpf = ''.join(filter(str.isdigit, cpf))
+    cpf = cpf.translate(_DIGITS_TABLE)
     
     try:
-        # Inicializa o TokenManager
-        token_manager = TokenManager()
+        # Obtém o TokenManager compartilhado
+        token_manager = get_token_manager()
         
-        # Obtém o token ativo
-        token_data = token_manager.get_active_token()
+        # Obtém o token ativo (do cache em processo, se válido)
+        token_data = get_cached_active_token(token_manager)
         
         if not token_data:
-            return JsonResponse({"error": "Nenhum token ativo encontrado"}, status=401)
+            return _err("Nenhum token ativo encontrado", status=401)
         
         # Obtém o access_token
         access_token = token_data.get("access_token")
         
         if not access_token:
-            return JsonResponse({"error": "Token inválido"}, status=401)
+            return _err("Token inválido", status=401)
         
+        # Cabeçalhos compartilhados pelas três chamadas do fluxo: o token é
+        # lido uma única vez do Firestore
+        headers = _bling_headers(access_token)
+
         # Passo 1: Busca o contato pelo CPF
-        contatos_endpoint = f"contatos?numeroDocumento={cpf}"
-        base_url = "https://api.bling.com.br/Api/v3"
-        url_contatos = f"{base_url}/{contatos_endpoint.lstrip('/')}"
-        
-        headers = {
-            "Authorization": f"Bearer {access_token}",
-            "Accept": "application/json",
-            "Content-Type": "application/json"
-        }
-        
-        logger.info(f"Realizando requisição para buscar contato por CPF: GET {url_contatos}")
-        response_contatos = requests.get(url_contatos, headers=headers)
-        
-        if response_contatos.status_code != 200:
-            return JsonResponse(response_contatos.json() if response_contatos.content else {"error": "Erro ao buscar contato"}, status=response_contatos.status_code)
-        
-        dados_contatos = response_contatos.json()
-        
+        dados_contatos, status_contatos = _bling_get_json("contatos", headers, params={"numeroDocumento": cpf})
+
+        if dados_contatos is None:
+            return _err("Erro ao buscar contato", status=status_contatos)
+
         # Verifica se encontrou algum contato
         if not dados_contatos.get('data'):
             return JsonResponse({"data": [], "contas_a_receber": [], "contato_detalhes": {}}, status=200)
-        
+
         # Passo 2: Extrai o ID do contato
         contato = dados_contatos['data'][0]
         id_contato = contato['id']
-        
-        # Passo 3: Busca os detalhes completos do contato
-        detalhes_contato = get_contato_by_id(request, id_contato)
-        
-        # Verifica se houve erro ao obter detalhes do contato
-        if 'error' in detalhes_contato:
-            logger.error(f"Erro ao obter detalhes do contato: {detalhes_contato['error']}")
-            detalhes_contato = {}
-        
-        # Passo 4: Busca as contas a receber deste contato
+
         # Filtra por situação 1 (Em aberto) por padrão
         situacao = request.GET.get('situacao', '1')
-        contas_endpoint = f"contas/receber?idContato={id_contato}"
-        
+        params_contas = {"idContato": id_contato}
+
         # Adiciona filtro de situação se necessário
         if situacao and situacao != '0':
-            contas_endpoint += f"&situacoes[]={situacao}"
-        
-        url_contas = f"{base_url}/{contas_endpoint.lstrip('/')}"
-        
-        logger.info(f"Realizando requisição para buscar contas a receber: GET {url_contas}")
-        response_contas = requests.get(url_contas, headers=headers)
-        
-        if response_contas.status_code != 200:
+            params_contas["situacoes[]"] = situacao
+
+        # Passos 3 e 4 em paralelo: detalhes do contato e contas a receber
+        # dependem apenas do id_contato, então o tempo total cai da soma das
+        # duas chamadas para a mais lenta delas (conexões do pool compartilhado)
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            future_detalhes = executor.submit(_bling_get_json, f"contatos/{id_contato}", headers)
+            future_contas = executor.submit(_bling_get_json, "contas/receber", headers, params_contas)
+            detalhes_contato, _ = future_detalhes.result()
+            dados_contas, _ = future_contas.result()
+
+        if detalhes_contato is None:
+            logger.error(f"Erro ao obter detalhes do contato: {id_contato}")
+            detalhes_contato = {}
+
+        if dados_contas is None:
             # Se falhar ao buscar contas, retorna ao menos os dados do contato
             return JsonResponse({
                 "data": dados_contatos.get('data', []),
@@ -709,8 +1057,6 @@ def teste_busca_por_cpf_completo(request):
                 "error_contas": "Erro ao buscar contas a receber"
             }, status=200)
         
-        dados_contas = response_contas.json()
-        
         # Passo 5: Monta o resultado completo
         resultado_completo = {
             "data": dados_contatos.get('data', []),
@@ -722,7 +1068,7 @@ def teste_busca_por_cpf_completo(request):
         
     except Exception as e:
         logger.error(f"Erro ao executar fluxo completo de busca por CPF: {str(e)}")
-        return JsonResponse({"error": f"Erro ao executar fluxo completo de busca por CPF: {str(e)}"}, status=500)
+        return _err(f"Erro ao executar fluxo completo de busca por CPF: {str(e)}", status=500)
 
 def delete_all_tokens(request):
     """
@@ -733,8 +1079,8 @@ def delete_all_tokens(request):
         JsonResponse com o número de tokens excluídos ou mensagem de erro
     """
     try:
-        # Inicializa o TokenManager
-        token_manager = TokenManager()
+        # Obtém o TokenManager compartilhado
+        token_manager = get_token_manager()
         
         # Exclui todos os tokens
         deleted_count = token_manager.delete_all_tokens()
@@ -744,62 +1090,60 @@ def delete_all_tokens(request):
             "message": f"{deleted_count} tokens foram excluídos com sucesso."
         })
         
-    except Exception as e:
-        logger.error(f"Erro ao excluir tokens: {str(e)}")
+    except Exception:
+        logger.exception("Erro ao excluir tokens")
         return JsonResponse({
             "success": False,
-            "error": f"Erro ao excluir tokens: {str(e)}"
+            "error": "Erro ao excluir tokens"
         }, status=500)
 
+# Prefixo constante da URL de autorização, montado e escapado uma única vez
+# no import: client_id e redirect_uri não mudam em tempo de execução, então
+# cada chamada só precisa anexar um state novo. None se não configurado.
+try:
+    _AUTH_URL_PREFIX = (
+        "https://www.bling.com.br/Api/v3/oauth/authorize?" + urlencode({
+            "response_type": "code",
+            "client_id": settings.BLING_CLIENT_ID,
+            "redirect_uri": settings.BLING_REDIRECT_URI,
+        }) + "&state="
+    ) if settings.BLING_CLIENT_ID else None
+except Exception as auth_url_error:
+    logging.error(f"Erro ao montar prefixo da URL de autorização: {auth_url_error}")
+    _AUTH_URL_PREFIX = None
+
 def generate_authorization_url(request, return_url_only=False):
     """
     Gera a URL de autorização para o Bling OAuth.
-    
+
     Args:
         request: Objeto de requisição do Django
         return_url_only: Se True, retorna apenas a URL como string
-    
+
     Returns:
         URL de autorização ou resposta JSON com a URL
     """
-    try:
-        client_id = settings.BLING_CLIENT_ID
-        redirect_uri = settings.BLING_REDIRECT_URI
-        
-        if not client_id:
-            logger.error("Client ID do Bling não configurado")
-            if return_url_only:
-                return None
-            return JsonResponse({
-                "success": False,
-                "error": "Client ID do Bling não configurado"
-            }, status=500)
-        
-        # Gera um state aleatório para segurança
-        import random
-        import string
-        state = ''.join(random.choices(string.ascii_letters + string.digits, k=16))
-        
-        # Constrói a URL de autorização
-        auth_url = f"https://www.bling.com.br/Api/v3/oauth/authorize?response_type=code&client_id={client_id}&state={state}&redirect_uri={redirect_uri}"
-        
-        if return_url_only:
-            return auth_url
-            
-        return JsonResponse({
-            "success": True,
-            "authorization_url": auth_url
-        })
-        
-    except Exception as e:
-        logger.error(f"Erro ao gerar URL de autorização: {str(e)}")
+    if _AUTH_URL_PREFIX is None:
+        logger.error("Client ID do Bling não configurado")
         if return_url_only:
             return None
         return JsonResponse({
             "success": False,
-            "error": f"Erro ao gerar URL de autorização: {str(e)}"
+            "error": "Client ID do Bling não configurado"
         }, status=500)
 
+    # Só o state (aleatório e criptograficamente seguro) muda por chamada;
+    # token_urlsafe já devolve caracteres seguros para URL, sem escape extra
+    auth_url = _AUTH_URL_PREFIX + secrets.token_urlsafe(16)
+
+    if return_url_only:
+        return auth_url
+
+    return JsonResponse({
+        "success": True,
+        "authorization_url": auth_url
+    })
+
 def verify_token_expiration(request):
     """
     Verifica manualmente a expiração do refresh token e envia notificações se necessário.
@@ -809,20 +1153,26 @@ def verify_token_expiration(request):
         JsonResponse com o status da verificação
     """
     try:
-        # Inicializa os gerenciadores
-        token_manager = TokenManager()
-        notification_manager = NotificationManager()
-        
-        # Obtém o token ativo para verificar se existe
-        token_data = token_manager.get_active_token()
+        # Obtém os gerenciadores compartilhados
+        token_manager = get_token_manager()
+        notification_manager = get_notification_manager()
+
+        # Obtém o token ativo (do cache em processo, se válido)
+        token_data = get_cached_active_token(token_manager)
         
         if not token_data:
-            return JsonResponse({
+            # A URL de autorização só é gerada sob demanda (?with_auth_url=1):
+            # a verificação em segundo plano não completa o fluxo OAuth, então
+            # gerar um state novo a cada chamada só desperdiçaria o CSPRNG e
+            # vazaria states que nunca serão validados
+            response_body = {
                 "status": "error",
                 "message": "Nenhum token ativo encontrado para verificar",
-                "auth_required": True,
-                "authorization_url": generate_authorization_url(request, return_url_only=True)
-            }, status=404)
+                "auth_required": True
+            }
+            if request.GET.get("with_auth_url"):
+                response_body["authorization_url"] = generate_authorization_url(request, return_url_only=True)
+            return JsonResponse(response_body, status=404)
         
         # Verifica a expiração do token
         notification_sent = notification_manager.check_token_expiration(token_manager)
@@ -831,40 +1181,36 @@ def verify_token_expiration(request):
         created_at = token_data.get('created_at')
         expires_in = token_data.get('expires_in', 21600)  # access token (6 horas)
         
-        # Converte para datetime se for um timestamp do Firestore
-        if hasattr(created_at, 'seconds') and hasattr(created_at, 'nanos'):
-            # É um timestamp do Firestore
-            created_at = datetime.fromtimestamp(created_at.seconds + created_at.nanos/1e9)
-        elif isinstance(created_at, str):
-            # É uma string ISO (possivelmente de um fallback local)
+        # Normaliza created_at para datetime com timezone antes de qualquer
+        # aritmética: o cliente do Firestore devolve DatetimeWithNanoseconds
+        # (subclasse de datetime), o fallback local devolve string ISO e um
+        # token sem o campo usa agora como aproximação. Com a garantia na
+        # entrada, o restante da função é código linear, sem guardas hasattr.
+        if isinstance(created_at, str):
             try:
                 created_at = datetime.fromisoformat(created_at)
             except ValueError:
                 created_at = datetime.now()
-        
+        elif created_at is None:
+            created_at = datetime.now()
+        if timezone.is_naive(created_at):
+            created_at = timezone.make_aware(created_at)
+
         # Calcula a expiração do access token e refresh token
-        from datetime import timedelta
+        now = timezone.now()
         access_expires_at = created_at + timedelta(seconds=expires_in)
         refresh_expires_at = created_at + timedelta(days=30)
-        
-        # Tempo restante em formato legível
-        from django.utils import timezone
-        now = timezone.now()
-        
-        # Se as datas não têm timezone, adiciona
-        if timezone.is_naive(created_at):
-            created_at = timezone.make_aware(created_at)
-        
+
         # Formata tempos restantes
-        access_days_remaining = (access_expires_at - now).days if hasattr(access_expires_at, 'days') else None
+        access_days_remaining = (access_expires_at - now).days
         refresh_days_remaining = (refresh_expires_at - now).days
-        
+
         result = {
             "status": "success",
             "message": "Verificação de expiração concluída",
             "token_info": {
-                "created_at": created_at.isoformat() if created_at else None,
-                "access_token_expires_at": access_expires_at.isoformat() if hasattr(access_expires_at, 'isoformat') else None,
+                "created_at": created_at.isoformat(),
+                "access_token_expires_at": access_expires_at.isoformat(),
                 "refresh_token_expires_at": refresh_expires_at.isoformat(),
                 "access_token_days_remaining": access_days_remaining,
                 "refresh_token_days_remaining": refresh_days_remaining
@@ -875,44 +1221,53 @@ def verify_token_expiration(request):
         # Se uma notificação foi enviada, adiciona detalhes
         if notification_sent:
             result["notification_info"] = {
-                "sent_at": timezone.now().isoformat(),
+                # Reutiliza o now já calculado: mantém sent_at coerente com os
+                # dias restantes mesmo quando as chamadas cruzariam um segundo
+                "sent_at": now.isoformat(),
                 "type": "emergency" if refresh_days_remaining <= 1 else "regular",
                 "email": settings.EMAIL_DESTINATARIO
             }
         
         return JsonResponse(result)
         
-    except Exception as e:
-        logger.error(f"Erro ao verificar expiração do token: {str(e)}")
+    except Exception:
+        logger.exception("Erro ao verificar expiração do token")
         return JsonResponse({
             "status": "error",
-            "error": f"Erro ao verificar expiração do token: {str(e)}"
+            "error": "Erro ao verificar expiração do token"
         }, status=500)
 
+# Executor de worker único para a verificação manual de expiração: a resposta
+# HTTP volta imediatamente em vez de esperar os round-trips Firestore + SMTP
+# da verificação, e execuções disparadas em sequência ficam enfileiradas
+_EXPIRATION_CHECK_EXECUTOR = ThreadPoolExecutor(max_workers=1)
+
 def run_token_expiration_check(request):
     """
-    Executa manualmente a tarefa agendada de verificação de expiração do token.
+    Dispara manualmente a tarefa agendada de verificação de expiração do token,
+    executando-a em segundo plano.
     Útil para testes em ambientes Windows onde o crontab não funciona.
     Endpoint: /api/token/run-expiration-check/
-    
+
     Returns:
-        JsonResponse com o resultado da verificação
+        JsonResponse 202 confirmando o agendamento da verificação
     """
     try:
         # Importa a função do cron.py
         from core.cron import check_token_expiration
-        
-        # Executa a verificação
-        check_token_expiration()
-        
+
+        # Enfileira a verificação em segundo plano; o resultado sai nos logs,
+        # como na execução via crontab
+        _EXPIRATION_CHECK_EXECUTOR.submit(check_token_expiration)
+
         return JsonResponse({
-            "status": "success",
-            "message": "Verificação de expiração executada manualmente com sucesso"
-        })
-        
-    except Exception as e:
-        logger.error(f"Erro ao executar verificação manual de expiração: {str(e)}")
+            "status": "accepted",
+            "message": "Verificação de expiração agendada para execução em segundo plano"
+        }, status=202)
+
+    except Exception:
+        logger.exception("Erro ao agendar verificação manual de expiração")
         return JsonResponse({
             "status": "error",
-            "error": f"Erro ao executar verificação manual: {str(e)}"
+            "error": "Erro ao agendar verificação manual"
         }, status=500)
\ No newline at end of file
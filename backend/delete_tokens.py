@@ -1,17 +1,23 @@
 import os
 import django
 
-# Configurar o ambiente Django
-os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'arlicenter.settings')
-django.setup()
 
-# Importar o TokenManager após configurar o Django
-from core.token_manager import TokenManager
+def main():
+    # Configurar o ambiente Django
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'arlicenter.settings')
+    django.setup()
 
-# Criar uma instância do TokenManager
-token_manager = TokenManager()
+    # Importar o TokenManager após configurar o Django
+    from core.token_manager import TokenManager
 
-# Chamar o método delete_all_tokens
-num_deleted = token_manager.delete_all_tokens()
+    # Criar uma instância do TokenManager
+    token_manager = TokenManager()
 
-print(f"Foram excluídos {num_deleted} tokens.") 
\ No newline at end of file
+    # Chamar o método delete_all_tokens
+    num_deleted = token_manager.delete_all_tokens()
+
+    print(f"Foram excluídos {num_deleted} tokens.")
+
+
+if __name__ == "__main__":
+    main()
@@ -7,29 +7,115 @@ import requests
 import json
 import argparse
 import os
+import sys
 import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
 from dotenv import load_dotenv
 
 # Carrega as variáveis de ambiente do arquivo .env
 load_dotenv()
 
+# Sessão HTTP compartilhada do script: reaproveita a conexão TLS com
+# api.bling.com.br entre as chamadas encadeadas (contato -> detalhes ->
+# contas), economizando um handshake completo por requisição
+_SESSION = requests.Session()
+_SESSION.mount('https://', requests.adapters.HTTPAdapter(pool_connections=4, pool_maxsize=8))
+_SESSION.headers.update({"Accept": "application/json"})
+
+# Timeout padrão (conexão, leitura) para não travar a sessão interativa
+_TIMEOUT = (3.05, 30)
+
+# Tabela para remover a pontuação de CPF/CNPJ numa única passada, sem as
+# strings intermediárias de replace encadeado (mesmo padrão das views)
+_CPF_STRIP = str.maketrans('', '', './-')
+
+# Banners estáticos montados uma vez no import e emitidos num único print,
+# em vez de uma chamada de escrita (e um flush em TTY) por linha
+_MANUAL_BANNER = "\n".join([
+    "\nNão foi possível obter o token automaticamente.",
+    "Você pode solicitar o token acessando a URL:",
+    "https://www.bling.com.br/Api/v3/oauth/authorize?response_type=code&client_id=bed1987ba698d05d51e7e669e9215f552662cecc&state=teste123&redirect_uri=https://arlicenter-api.onrender.com/auth/callback/",
+    "\nOU pode consultar o token atual através do endpoint:",
+    "https://arlicenter-api.onrender.com/auth/api/token/",
+])
+
+_SITUACOES_HELP = "\n".join([
+    "\nSituações disponíveis:",
+    "1 - Em aberto",
+    "2 - Recebido",
+    "3 - Parcialmente recebido",
+    "0 - Todas as situações",
+])
+
+# Prints de depuração (URL, cabeçalhos, status code) só com BLING_DEBUG=1:
+# por padrão o caminho comum nem chega a formatar as f-strings
+DEBUG = os.getenv('BLING_DEBUG') == '1'
+
+@lru_cache(maxsize=4)
+def _auth_headers(token):
+    """
+    Monta (e memoriza) os cabeçalhos de autenticação para um token
+
+    O mesmo token é usado em todas as chamadas de um fluxo, então o dict é
+    construído uma vez e reaproveitado em vez de remontado por requisição.
+
+    Args:
+        token: Token de acesso, com ou sem o prefixo "Bearer "
+
+    Returns:
+        dict: Cabeçalhos prontos para as chamadas à API
+    """
+    auth = token if token.startswith("Bearer ") else f"Bearer {token}"
+    return {
+        "Accept": "application/json",
+        "Authorization": auth,
+        "Content-Type": "application/json"
+    }
+
+# Credenciais lidas uma única vez após o load_dotenv: são imutáveis durante
+# a vida do processo, então não há motivo para consultar os.environ a cada
+# renovação de token
+BLING_CLIENT_ID = os.getenv('BLING_CLIENT_ID', 'bed1987ba698d05d51e7e669e9215f552662cecc')
+BLING_CLIENT_SECRET = os.getenv('BLING_CLIENT_SECRET', '')
+
+# Partes estáticas da requisição de renovação, montadas no import
+_RENOVAR_URL = "https://api.bling.com.br/Api/v3/oauth/token"
+_RENOVAR_HEADERS = {
+    "Accept": "application/json",
+    "Content-Type": "application/x-www-form-urlencoded"
+}
+_RENOVAR_PAYLOAD_BASE = {"grant_type": "refresh_token"}
+if BLING_CLIENT_ID:
+    _RENOVAR_PAYLOAD_BASE["client_id"] = BLING_CLIENT_ID
+if BLING_CLIENT_SECRET:
+    _RENOVAR_PAYLOAD_BASE["client_secret"] = BLING_CLIENT_SECRET
+
+# Cache do caminho do diretório de tokens: quase todo helper chama
+# criar_diretorio_tokens(), então resolver o caminho e repetir o stat/mkdir
+# a cada chamada só gera syscalls redundantes numa sessão interativa
+_tokens_dir_cache = None
+
 def criar_diretorio_tokens():
     """
-    Garante que o diretório de tokens exista
-    
+    Garante que o diretório de tokens exista (resolvido uma única vez por processo)
+
     Returns:
         str: Caminho do diretório de tokens
     """
+    global _tokens_dir_cache
+    if _tokens_dir_cache is not None:
+        return _tokens_dir_cache
+
     tokens_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'bling_tokens')
-    
-    # Cria o diretório se não existir
-    if not os.path.exists(tokens_dir):
-        try:
-            os.makedirs(tokens_dir)
-            print(f"Diretório de tokens criado: {tokens_dir}")
-        except Exception as e:
-            print(f"Erro ao criar diretório de tokens: {str(e)}")
-    
+
+    # exist_ok=True dispensa o par exists+makedirs (um stat a menos)
+    try:
+        os.makedirs(tokens_dir, exist_ok=True)
+    except Exception as e:
+        print(f"Erro ao criar diretório de tokens: {str(e)}")
+
+    _tokens_dir_cache = tokens_dir
     return tokens_dir
 
 def obter_token_do_arquivo():
@@ -49,25 +135,29 @@ def obter_token_do_arquivo():
             print("ATENÇÃO: Este token está expirado!")
         return ultimo_token_data.get('access_token'), ultimo_token_data.get('refresh_token')
     
-    # Lista todos os arquivos de token
-    arquivos_token = [os.path.join(tokens_dir, f) for f in os.listdir(tokens_dir) if f.startswith('token_') and f.endswith('.json')]
-    
-    if not arquivos_token:
+    # Seleciona o arquivo de token mais recente numa única passada: scandir
+    # devolve DirEntry com o stat em cache (nenhum getmtime extra) e max()
+    # acha o mais novo em O(N), sem materializar nem ordenar a lista toda
+    with os.scandir(tokens_dir) as it:
+        mais_recente = max(
+            (e for e in it if e.name.startswith('token_') and e.name.endswith('.json') and e.is_file()),
+            key=lambda e: e.stat().st_mtime,
+            default=None,
+        )
+
+    if mais_recente is None:
         print("Nenhum arquivo de token encontrado")
         return obter_token_manual()
-    
-    # Ordena por data de modificação, mais recente primeiro
-    arquivos_token.sort(key=lambda x: os.path.getmtime(x), reverse=True)
-    
+
     # Carrega o token mais recente
-    with open(arquivos_token[0], 'r') as f:
+    with open(mais_recente.path, 'r') as f:
         token_data = json.load(f)
-        
+
     if 'access_token' not in token_data:
         print("Token inválido, não contém access_token")
         return obter_token_manual()
-        
-    print(f"Token carregado do arquivo: {arquivos_token[0]}")
+
+    print(f"Token carregado do arquivo: {mais_recente.path}")
     
     # Verifica se o token está expirado
     token_expiracao = token_data.get('data_expiracao')
@@ -96,11 +186,17 @@ def salvar_ultimo_token(token_data):
     """
     tokens_dir = criar_diretorio_tokens()
     
-    # Salva como último token utilizado
+    # Salva como último token utilizado: escreve num .tmp e troca com
+    # os.replace (atômico), para que um leitor concorrente ou uma queda no
+    # meio da escrita nunca deixe um ultimo_token.json truncado — que
+    # forçaria obter_ultimo_token_utilizado a cair no fallback lento de
+    # varrer o diretório inteiro
     ultimo_token_path = os.path.join(tokens_dir, "ultimo_token.json")
+    tmp_path = ultimo_token_path + '.tmp'
     try:
-        with open(ultimo_token_path, 'w', encoding='utf-8') as f:
+        with open(tmp_path, 'w', encoding='utf-8') as f:
             json.dump(token_data, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, ultimo_token_path)
         print(f"Token salvo como último utilizado em: {ultimo_token_path}")
         return True
     except Exception as e:
@@ -115,14 +211,17 @@ def salvar_token(token_data):
         token_data: Dicionário com os dados do token (access_token, refresh_token, etc)
     """
     tokens_dir = criar_diretorio_tokens()
-    
+
+    # Um único time.time() por chamada: o mesmo instante vale para o nome do
+    # arquivo e para a data de expiração, que ficam sempre consistentes
+    agora = int(time.time())
+
     # Nome do arquivo com timestamp
-    nome_arquivo = f"token_{int(time.time())}.json"
+    nome_arquivo = f"token_{agora}.json"
     caminho_completo = os.path.join(tokens_dir, nome_arquivo)
-    
+
     # Adiciona data de expiração, se não estiver presente
     if 'expires_in' in token_data and 'data_expiracao' not in token_data:
-        agora = int(time.time())
         token_data['data_expiracao'] = agora + int(token_data.get('expires_in', 0))
     
     try:
@@ -149,33 +248,51 @@ def verificar_expiracao_token(token_data):
         bool: True se o token está expirado, False caso contrário
     """
     expiracao = token_data.get('data_expiracao')
-    if not expiracao:
-        return False
-    
-    try:
-        agora = int(time.time())
-        expiracao = int(expiracao)
-        return expiracao < agora
-    except:
+    if expiracao is None:
         return False
 
+    # salvar_token grava data_expiracao como int, então o caminho comum
+    # compara direto, sem conversão nem try/except; o int() fica apenas como
+    # migração para arquivos antigos que tenham gravado o valor como string
+    if not isinstance(expiracao, (int, float)):
+        try:
+            expiracao = int(expiracao)
+        except (TypeError, ValueError):
+            return False
+
+    return expiracao < time.time()
+
+# Cache do ultimo_token.json já analisado, chaveado pelo mtime do arquivo:
+# a função é chamada várias vezes por sessão (modo_interativo, main,
+# obter_token_do_arquivo) e reparsear o mesmo JSON a cada chamada é
+# desperdício; o mtime em nanossegundos detecta qualquer reescrita
+_last_token_cache = {'mtime': None, 'data': None}
+
 def obter_ultimo_token_utilizado():
     """
     Obtém o último token utilizado com sucesso
-    
+
     Returns:
         tuple: (token_data, caminho_arquivo) ou (None, None) se não encontrado
     """
     tokens_dir = criar_diretorio_tokens()
     ultimo_token_path = os.path.join(tokens_dir, "ultimo_token.json")
-    
-    if not os.path.exists(ultimo_token_path):
+
+    try:
+        mtime = os.stat(ultimo_token_path).st_mtime_ns
+    except OSError:
         return None, None
-    
+
+    # Reaproveita o dicionário já carregado se o arquivo não mudou
+    if mtime == _last_token_cache['mtime']:
+        return _last_token_cache['data'], ultimo_token_path
+
     try:
         with open(ultimo_token_path, 'r') as f:
             token_data = json.load(f)
-            return token_data, ultimo_token_path
+        _last_token_cache['mtime'] = mtime
+        _last_token_cache['data'] = token_data
+        return token_data, ultimo_token_path
     except Exception as e:
         print(f"Erro ao ler último token: {str(e)}")
         return None, None
@@ -194,32 +311,13 @@ def renovar_token(refresh_token):
         print("Nenhum refresh_token disponível para renovação")
         return None, None
     
-    # Obter credenciais do arquivo .env ou definir valores padrão
-    client_id = os.getenv('BLING_CLIENT_ID', 'bed1987ba698d05d51e7e669e9215f552662cecc')
-    client_secret = os.getenv('BLING_CLIENT_SECRET', '')
-    
-    url = "https://api.bling.com.br/Api/v3/oauth/token"
-    
-    headers = {
-        "Accept": "application/json",
-        "Content-Type": "application/x-www-form-urlencoded"
-    }
-    
-    payload = {
-        "grant_type": "refresh_token",
-        "refresh_token": refresh_token
-    }
-    
-    # Adiciona client_id e client_secret se disponíveis
-    if client_id:
-        payload["client_id"] = client_id
-    if client_secret:
-        payload["client_secret"] = client_secret
-    
+    # Só o refresh_token muda entre chamadas; o resto do payload é estático
+    payload = {**_RENOVAR_PAYLOAD_BASE, "refresh_token": refresh_token}
+
     print(f"Renovando token usando refresh_token: {refresh_token[:10]}...")
-    
+
     try:
-        response = requests.post(url, headers=headers, data=payload)
+        response = _SESSION.post(_RENOVAR_URL, headers=_RENOVAR_HEADERS, data=payload, timeout=_TIMEOUT)
         
         print(f"Status code: {response.status_code}")
         
@@ -242,11 +340,7 @@ def obter_token_manual():
     """
     Solicita o token manualmente ao usuário, caso não seja possível obtê-lo automaticamente
     """
-    print("\nNão foi possível obter o token automaticamente.")
-    print("Você pode solicitar o token acessando a URL:")
-    print("https://www.bling.com.br/Api/v3/oauth/authorize?response_type=code&client_id=bed1987ba698d05d51e7e669e9215f552662cecc&state=teste123&redirect_uri=https://arlicenter-api.onrender.com/auth/callback/")
-    print("\nOU pode consultar o token atual através do endpoint:")
-    print("https://arlicenter-api.onrender.com/auth/api/token/")
+    print(_MANUAL_BANNER)
     
     # Solicita o token diretamente ao usuário
     token = input("\nPor favor, cole o token de acesso aqui: ").strip()
@@ -293,28 +387,21 @@ def buscar_contato_por_cpf(token, cpf):
     Busca um contato pelo CPF/CNPJ
     """
     url = f"https://api.bling.com.br/Api/v3/contatos?numeroDocumento={cpf}"
-    
-    # Verifica se o token já tem o prefixo "Bearer"
-    auth_token = token
-    if not token.startswith("Bearer "):
-        auth_token = f"Bearer {token}"
-    
-    headers = {
-        "Accept": "application/json",
-        "Authorization": auth_token,
-        "Content-Type": "application/json"
-    }
-    
+
+    headers = _auth_headers(token)
+
     print(f"Buscando contato com CPF/CNPJ: {cpf}")
-    print(f"URL: {url}")
-    print(f"Authorization: {auth_token[:15]}...")  # Mostra apenas o início do token por segurança
-    print(f"Headers completos: {headers}")
-    
+    if DEBUG:
+        print(f"URL: {url}")
+        print(f"Authorization: {headers['Authorization'][:15]}...")  # Mostra apenas o início do token por segurança
+        print(f"Headers completos: {headers}")
+
     try:
-        response = requests.get(url, headers=headers)
-        
-        print(f"Status code: {response.status_code}")
-        
+        response = _SESSION.get(url, headers=headers, timeout=_TIMEOUT)
+
+        if DEBUG:
+            print(f"Status code: {response.status_code}")
+
         if response.status_code != 200:
             print(f"Erro ao buscar contato: {response.status_code}")
             print(f"Resposta: {response.text}")
@@ -342,16 +429,8 @@ def buscar_contas_a_receber_por_contato(token, id_contato, situacao=None):
     if situacao:
         url += f"&situacoes[]={situacao}"
     
-    # Verifica se o token já tem o prefixo "Bearer"
-    auth_token = token
-    if not token.startswith("Bearer "):
-        auth_token = f"Bearer {token}"
-    
-    headers = {
-        "Accept": "application/json",
-        "Authorization": auth_token
-    }
-    
+    headers = _auth_headers(token)
+
     print(f"Buscando contas a receber para o contato: {id_contato}")
     if situacao:
         situacoes = {
@@ -360,14 +439,16 @@ def buscar_contas_a_receber_por_contato(token, id_contato, situacao=None):
             "3": "Parcialmente recebido"
         }
         print(f"Filtrando por situação: {situacoes.get(str(situacao), situacao)}")
-    print(f"URL: {url}")
-    print(f"Authorization: {auth_token[:10]}...")  # Mostra apenas o início do token por segurança
-    
+    if DEBUG:
+        print(f"URL: {url}")
+        print(f"Authorization: {headers['Authorization'][:10]}...")  # Mostra apenas o início do token por segurança
+
     try:
-        response = requests.get(url, headers=headers)
-        
-        print(f"Status code: {response.status_code}")
-        
+        response = _SESSION.get(url, headers=headers, timeout=_TIMEOUT)
+
+        if DEBUG:
+            print(f"Status code: {response.status_code}")
+
         if response.status_code != 200:
             print(f"Erro ao buscar contas a receber: {response.status_code}")
             print(f"Resposta: {response.text}")
@@ -403,24 +484,16 @@ def fluxo_completo(token, cpf, situacao=None):
     
     # Buscar os detalhes do contato para obter o limite de crédito
     url_detalhes = f"https://api.bling.com.br/Api/v3/contatos/{id_contato}"
-    
-    # Verifica se o token já tem o prefixo "Bearer"
-    auth_token = token
-    if not token.startswith("Bearer "):
-        auth_token = f"Bearer {token}"
-    
-    headers = {
-        "Accept": "application/json",
-        "Authorization": auth_token,
-        "Content-Type": "application/json"
-    }
-    
+
+    headers = _auth_headers(token)
+
     print(f"Buscando detalhes do contato com ID: {id_contato}")
     try:
-        response_detalhes = requests.get(url_detalhes, headers=headers)
-        
-        print(f"Status code (detalhes): {response_detalhes.status_code}")
-        
+        response_detalhes = _SESSION.get(url_detalhes, headers=headers, timeout=_TIMEOUT)
+
+        if DEBUG:
+            print(f"Status code (detalhes): {response_detalhes.status_code}")
+
         if response_detalhes.status_code != 200:
             print(f"Erro ao buscar detalhes do contato: {response_detalhes.status_code}")
             detalhes_contato = None
@@ -449,180 +522,227 @@ def fluxo_completo(token, cpf, situacao=None):
     
     return resultado
 
+def fluxo_completo_batch(token, cpfs, situacao=None, max_workers=8):
+    """
+    Executa fluxo_completo para vários CPFs em paralelo
+
+    Cada fluxo é limitado por I/O de rede, então rodar os CPFs num pool de
+    threads sobrepõe as latências das requisições (a _SESSION compartilhada
+    é thread-safe para get/post simples). O tempo total passa de N fluxos
+    sequenciais para aproximadamente N/max_workers.
+
+    Args:
+        token: Token de acesso
+        cpfs: Lista de CPFs/CNPJs a consultar
+        situacao: Situação das contas a receber (opcional)
+        max_workers: Número máximo de consultas simultâneas
+
+    Returns:
+        dict: Mapeamento cpf -> resultado do fluxo_completo (ou None)
+    """
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        resultados = executor.map(lambda cpf: fluxo_completo(token, cpf, situacao), cpfs)
+        return dict(zip(cpfs, resultados))
+
+# Cache do diretório de resultados, criado uma única vez por processo
+# (mesmo padrão do diretório de tokens)
+_resultados_dir_cache = None
+
+def _criar_diretorio_resultados():
+    """
+    Garante que o diretório de resultados exista (resolvido uma vez por processo)
+
+    Returns:
+        str: Caminho do diretório de resultados
+    """
+    global _resultados_dir_cache
+    if _resultados_dir_cache is None:
+        resultados_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'resultados_bling')
+        os.makedirs(resultados_dir, exist_ok=True)
+        _resultados_dir_cache = resultados_dir
+    return _resultados_dir_cache
+
 def salvar_resultado(dados, nome_arquivo="resultado_bling.json"):
     """
     Salva o resultado da consulta em um arquivo JSON
     """
-    # Definir o diretório para salvar os resultados
-    resultados_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'resultados_bling')
-    
-    # Cria o diretório se não existir
-    if not os.path.exists(resultados_dir):
-        os.makedirs(resultados_dir)
-    
-    # Adiciona timestamp ao nome do arquivo para evitar sobrescrever
+    resultados_dir = _criar_diretorio_resultados()
+
+    # Adiciona timestamp ao nome do arquivo para evitar sobrescrever;
+    # splitext separa base e extensão numa passada só, sem os dois rsplit
     timestamp = time.strftime("%Y%m%d_%H%M%S")
-    nome_base = nome_arquivo.rsplit('.', 1)[0]
-    extensao = nome_arquivo.rsplit('.', 1)[1] if '.' in nome_arquivo else 'json'
-    nome_completo = f"{nome_base}_{timestamp}.{extensao}"
-    
+    nome_base, extensao = os.path.splitext(nome_arquivo)
+    nome_completo = f"{nome_base}_{timestamp}{extensao or '.json'}"
+
     # Caminho completo do arquivo
     caminho_completo = os.path.join(resultados_dir, nome_completo)
-    
+
     with open(caminho_completo, 'w', encoding='utf-8') as f:
         json.dump(dados, f, ensure_ascii=False, indent=2)
-    
+
     print(f"Resultado salvo no arquivo: {caminho_completo}")
 
+def _imprimir_resumo_contas(contas):
+    """
+    Imprime o resumo das contas a receber numa única escrita
+
+    Monta todas as linhas em memória e emite um único print: num TTY cada
+    print descarrega o buffer, então N contas custavam N idas ao terminal.
+
+    Args:
+        contas: Lista de contas a receber
+    """
+    linhas = ["\nResumo das contas a receber:"]
+    total_valor = 0
+    for i, conta in enumerate(contas):
+        valor = float(conta.get('valor', 0))
+        total_valor += valor
+        valor_formatado = f"R$ {valor:.2f}".replace('.', ',')
+        linhas.append(f"{i+1}. Vencimento: {conta.get('vencimento')}, Valor: {valor_formatado}, Situação: {conta.get('situacao')}")
+
+    # Exibe o total
+    total_formatado = f"R$ {total_valor:.2f}".replace('.', ',')
+    linhas.append(f"\nTotal: {total_formatado}")
+    print("\n".join(linhas))
+
 def modo_interativo():
     """
     Executa o script em modo interativo, perguntando o CPF ao usuário
     """
-    print("\n=== TESTE DE CONSULTA DE CONTAS A RECEBER DO BLING ===\n")
+    while True:
+        print("\n=== TESTE DE CONSULTA DE CONTAS A RECEBER DO BLING ===\n")
     
-    # Verifica se existe um token utilizado anteriormente
-    ultimo_token_data, ultimo_token_path = obter_ultimo_token_utilizado()
-    token = None
-    refresh_token = None
+        # Verifica se existe um token utilizado anteriormente
+        ultimo_token_data, ultimo_token_path = obter_ultimo_token_utilizado()
+        token = None
+        refresh_token = None
     
-    if ultimo_token_data:
-        # Verifica se o token anterior está expirado
-        token_expirado = verificar_expiracao_token(ultimo_token_data)
+        if ultimo_token_data:
+            # Verifica se o token anterior está expirado
+            token_expirado = verificar_expiracao_token(ultimo_token_data)
         
-        # Formata data de expiração
-        if 'data_expiracao' in ultimo_token_data:
-            data_expiracao = time.strftime('%d/%m/%Y %H:%M:%S', 
-                                            time.localtime(int(ultimo_token_data['data_expiracao'])))
-        else:
-            data_expiracao = "Desconhecida"
+            # Formata data de expiração
+            if 'data_expiracao' in ultimo_token_data:
+                data_expiracao = time.strftime('%d/%m/%Y %H:%M:%S', 
+                                                time.localtime(int(ultimo_token_data['data_expiracao'])))
+            else:
+                data_expiracao = "Desconhecida"
         
-        print(f"Encontrado token usado anteriormente.")
-        print(f"Data de expiração: {data_expiracao}")
+            print(f"Encontrado token usado anteriormente.")
+            print(f"Data de expiração: {data_expiracao}")
         
-        if token_expirado:
-            print("ATENÇÃO: Este token está expirado!")
+            if token_expirado:
+                print("ATENÇÃO: Este token está expirado!")
         
-        usar_ultimo = input("Deseja usar o último token utilizado? (s/n): ").strip().lower()
-        if usar_ultimo == 's':
-            token = ultimo_token_data.get('access_token')
-            refresh_token = ultimo_token_data.get('refresh_token')
-            print("Usando o último token.")
+            usar_ultimo = input("Deseja usar o último token utilizado? (s/n): ").strip().lower()
+            if usar_ultimo == 's':
+                token = ultimo_token_data.get('access_token')
+                refresh_token = ultimo_token_data.get('refresh_token')
+                print("Usando o último token.")
             
-            # Se o token estiver expirado, pergunta se deseja renovar
-            if token_expirado and refresh_token:
-                renovar = input("Token expirado. Deseja tentar renovar com o refresh_token? (s/n): ").strip().lower()
-                if renovar == 's':
-                    novo_token, novo_refresh = renovar_token(refresh_token)
-                    if novo_token:
-                        token = novo_token
-                        refresh_token = novo_refresh
-                        print("Token renovado com sucesso!")
-                    else:
-                        print("Falha ao renovar o token. Continuando com o token atual.")
-    
-    # Se não existir um token anterior ou o usuário optar por não usá-lo
-    if not token:
-        # Opção para inserir token manualmente
-        manual = input("Deseja inserir um novo token manualmente? (s/n): ").strip().lower()
-        if manual == 's':
-            novo_token, novo_refresh = obter_token_manual()
-            if novo_token:
-                token = novo_token
-                refresh_token = novo_refresh
-                print("Token atualizado com sucesso!")
-        else:
-            # Obtém o token dos arquivos salvos
-            token, refresh_token = obter_token_do_arquivo()
+                # Se o token estiver expirado, pergunta se deseja renovar
+                if token_expirado and refresh_token:
+                    renovar = input("Token expirado. Deseja tentar renovar com o refresh_token? (s/n): ").strip().lower()
+                    if renovar == 's':
+                        novo_token, novo_refresh = renovar_token(refresh_token)
+                        if novo_token:
+                            token = novo_token
+                            refresh_token = novo_refresh
+                            print("Token renovado com sucesso!")
+                        else:
+                            print("Falha ao renovar o token. Continuando com o token atual.")
+    
+        # Se não existir um token anterior ou o usuário optar por não usá-lo
+        if not token:
+            # Opção para inserir token manualmente
+            manual = input("Deseja inserir um novo token manualmente? (s/n): ").strip().lower()
+            if manual == 's':
+                novo_token, novo_refresh = obter_token_manual()
+                if novo_token:
+                    token = novo_token
+                    refresh_token = novo_refresh
+                    print("Token atualizado com sucesso!")
+            else:
+                # Obtém o token dos arquivos salvos
+                token, refresh_token = obter_token_do_arquivo()
             
-            if not token:
-                print("Token de acesso não encontrado. Por favor, autorize a aplicação no Bling primeiro.")
-                return
+                if not token:
+                    print("Token de acesso não encontrado. Por favor, autorize a aplicação no Bling primeiro.")
+                    break
             
-            # Opção para renovar o token
-            if refresh_token:
-                renovar = input("Deseja tentar renovar o token com o refresh_token? (s/n): ").strip().lower()
-                if renovar == 's':
-                    novo_token, novo_refresh = renovar_token(refresh_token)
-                    if novo_token:
-                        token = novo_token
-                        refresh_token = novo_refresh
-                        print("Token renovado com sucesso!")
-                    else:
-                        print("Falha ao renovar o token. Continuando com o token atual.")
-    
-    # Solicita o CPF ao usuário
-    cpf = input("Digite o CPF/CNPJ sem pontuação: ").strip()
-    if not cpf:
-        print("CPF/CNPJ não informado. Saindo.")
-        return
-    
-    # Remove pontuações caso o usuário tenha digitado
-    cpf = cpf.replace('.', '').replace('-', '').replace('/', '')
-    
-    # Solicita a situação desejada
-    print("\nSituações disponíveis:")
-    print("1 - Em aberto")
-    print("2 - Recebido")
-    print("3 - Parcialmente recebido")
-    print("0 - Todas as situações")
-    
-    situacao = input("Digite o número da situação desejada (padrão: 0): ").strip()
+                # Opção para renovar o token
+                if refresh_token:
+                    renovar = input("Deseja tentar renovar o token com o refresh_token? (s/n): ").strip().lower()
+                    if renovar == 's':
+                        novo_token, novo_refresh = renovar_token(refresh_token)
+                        if novo_token:
+                            token = novo_token
+                            refresh_token = novo_refresh
+                            print("Token renovado com sucesso!")
+                        else:
+                            print("Falha ao renovar o token. Continuando com o token atual.")
+    
+        # Solicita o CPF ao usuário
+        cpf = input("Digite o CPF/CNPJ sem pontuação: ").strip()
+        if not cpf:
+            print("CPF/CNPJ não informado. Saindo.")
+            break
+    
+        # Remove pontuações caso o usuário tenha digitado
+        cpf = cpf.translate(_CPF_STRIP)
+    
+        # Solicita a situação desejada
+        print(_SITUACOES_HELP)
+    
+        situacao = input("Digite o número da situação desejada (padrão: 0): ").strip()
+    
+        # Converte para None se for 0 ou vazio
+        if not situacao or situacao == "0":
+            situacao = None
     
-    # Converte para None se for 0 ou vazio
-    if not situacao or situacao == "0":
-        situacao = None
-    
-    # Executa o fluxo completo
-    resultado = fluxo_completo(token, cpf, situacao)
+        # Executa o fluxo completo
+        resultado = fluxo_completo(token, cpf, situacao)
     
-    # Exibe um resumo do resultado
-    if resultado:
-        nome = resultado['contato']['nome']
-        qtd_contas = len(resultado['contas_a_receber'])
-        print(f"\nResultado para {nome}: {qtd_contas} contas a receber encontradas")
+        # Exibe um resumo do resultado
+        if resultado:
+            nome = resultado['contato']['nome']
+            qtd_contas = len(resultado['contas_a_receber'])
+            print(f"\nResultado para {nome}: {qtd_contas} contas a receber encontradas")
         
-        # Exibe o limite de crédito
-        if resultado.get('detalhes_contato') and resultado['detalhes_contato'].get('financeiro'):
-            limite_credito = resultado['detalhes_contato']['financeiro'].get('limiteCredito', 0)
-            print(f"\nLimite de crédito: R$ {limite_credito:.2f}".replace('.', ','))
+            # Exibe o limite de crédito
+            if resultado.get('detalhes_contato') and resultado['detalhes_contato'].get('financeiro'):
+                limite_credito = resultado['detalhes_contato']['financeiro'].get('limiteCredito', 0)
+                print(f"\nLimite de crédito: R$ {limite_credito:.2f}".replace('.', ','))
             
-            # Calcula o total das contas a receber em aberto
-            total_valor_aberto = 0
-            for conta in resultado['contas_a_receber']:
-                if conta.get('situacao') == 1 or conta.get('situacao') == 'aberto':
-                    total_valor_aberto += float(conta.get('valor', 0))
+                # Calcula o total das contas a receber em aberto
+                total_valor_aberto = 0
+                for conta in resultado['contas_a_receber']:
+                    if conta.get('situacao') == 1 or conta.get('situacao') == 'aberto':
+                        total_valor_aberto += float(conta.get('valor', 0))
             
-            # Calcula o percentual do limite utilizado
-            if limite_credito > 0:
-                percentual_utilizado = (total_valor_aberto / limite_credito) * 100
-                print(f"Total em aberto: R$ {total_valor_aberto:.2f}".replace('.', ','))
-                print(f"Percentual do limite utilizado: {percentual_utilizado:.1f}%".replace('.', ','))
+                # Calcula o percentual do limite utilizado
+                if limite_credito > 0:
+                    percentual_utilizado = (total_valor_aberto / limite_credito) * 100
+                    print(f"Total em aberto: R$ {total_valor_aberto:.2f}".replace('.', ','))
+                    print(f"Percentual do limite utilizado: {percentual_utilizado:.1f}%".replace('.', ','))
         
-        # Mostra resumo das contas
-        if qtd_contas > 0:
-            print("\nResumo das contas a receber:")
-            total_valor = 0
-            for i, conta in enumerate(resultado['contas_a_receber']):
-                valor = float(conta.get('valor', 0))
-                total_valor += valor
-                valor_formatado = f"R$ {valor:.2f}".replace('.', ',')
-                print(f"{i+1}. Vencimento: {conta.get('vencimento')}, Valor: {valor_formatado}, Situação: {conta.get('situacao')}")
-            
-            # Exibe o total
-            total_formatado = f"R$ {total_valor:.2f}".replace('.', ',')
-            print(f"\nTotal: {total_formatado}")
-            
-            # Pergunta se deseja salvar o resultado
-            salvar = input("\nDeseja salvar o resultado em um arquivo? (s/n): ").strip().lower()
-            if salvar == 's':
-                salvar_resultado(resultado)
-        else:
-            print("Este contato não possui contas a receber registradas.")
-    
-    # Pergunta se deseja fazer outra consulta
-    outra = input("\nDeseja fazer outra consulta? (s/n): ").strip().lower()
-    if outra == 's':
-        modo_interativo()
+            # Mostra resumo das contas
+            if qtd_contas > 0:
+                _imprimir_resumo_contas(resultado['contas_a_receber'])
+
+                # Pergunta se deseja salvar o resultado
+                salvar = input("\nDeseja salvar o resultado em um arquivo? (s/n): ").strip().lower()
+                if salvar == 's':
+                    salvar_resultado(resultado)
+            else:
+                print("Este contato não possui contas a receber registradas.")
+    
+        # Pergunta se deseja fazer outra consulta; o laço substitui a
+        # autochamada recursiva, que acumulava um frame (com o resultado
+        # inteiro retido) por consulta em sessões longas
+        outra = input("\nDeseja fazer outra consulta? (s/n): ").strip().lower()
+        if outra != 's':
+            break
 
 def main():
     parser = argparse.ArgumentParser(description='Teste de chamadas à API do Bling')
@@ -639,7 +759,7 @@ def main():
     args = parser.parse_args()
     
     # Verifica se deve executar em modo interativo
-    if args.interativo or len(os.sys.argv) == 1:  # Executa interativo se não houver argumentos
+    if args.interativo or len(sys.argv) == 1:  # Executa interativo se não houver argumentos
         modo_interativo()
         return
     
@@ -729,17 +849,7 @@ def main():
             
             # Mostra resumo das contas
             if qtd_contas > 0:
-                print("\nResumo das contas a receber:")
-                total_valor = 0
-                for i, conta in enumerate(resultado['contas_a_receber']):
-                    valor = float(conta.get('valor', 0))
-                    total_valor += valor
-                    valor_formatado = f"R$ {valor:.2f}".replace('.', ',')
-                    print(f"{i+1}. Vencimento: {conta.get('vencimento')}, Valor: {valor_formatado}, Situação: {conta.get('situacao')}")
-                
-                # Exibe o total
-                total_formatado = f"R$ {total_valor:.2f}".replace('.', ',')
-                print(f"\nTotal: {total_formatado}")
+                _imprimir_resumo_contas(resultado['contas_a_receber'])
         else:
             # Caso de apenas contas a receber
             qtd_contas = len(resultado.get('data', []))
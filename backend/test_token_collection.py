@@ -5,23 +5,25 @@ Script para testar a criação e manipulação da coleção de tokens no Firesto
 
 import os
 import sys
-import django
 from pathlib import Path
 
 # Adiciona o diretório pai ao path para poder importar o projeto Django
 sys.path.append(str(Path(__file__).resolve().parent))
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "arlicenter.settings")
-django.setup()
-
-# Agora podemos importar do projeto Django
-from core.token_manager import TokenManager
 
 def test_token_collection():
     """
     Testa a criação e manipulação da coleção de tokens no Firestore.
     """
+    # O bootstrap do Django (django.setup carrega todos os INSTALLED_APPS) e
+    # o import do TokenManager ficam aqui dentro: importar este módulo para
+    # descoberta/introspecção não deve pagar a inicialização completa
+    import django
+    django.setup()
+    from core.token_manager import TokenManager
+
     print("\n=== Testando Coleção de Tokens no Firestore ===")
-    
+
     # Inicializa o gerenciador de tokens
     token_manager = TokenManager()
     
@@ -86,8 +88,9 @@ def test_token_collection():
     
     print("\n   Índices compostos:")
     for idx in indexes["composite"]:
-        print(f"   - Nome: {idx['name']}")
-        print(f"     Campos: {', '.join([f'{f['field']} ({f['order']})' for f in idx['fields']])}")
+        # Expressão geradora direto no join: sem a lista intermediária
+        campos = ', '.join(f"{f['field']} ({f['order']})" for f in idx['fields'])
+        print(f"   - Nome: {idx['name']}\n     Campos: {campos}")
     
     print("\n=== Testes concluídos com sucesso! ===")
     return True
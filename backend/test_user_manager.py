@@ -4,39 +4,96 @@ Script para testar as funcionalidades do UserManager
 """
 
 import os
+import re
 import sys
 import json
 import argparse
+import contextlib
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
 from dotenv import load_dotenv
 
-# Adiciona o diretório atual ao path
-sys.path.append(os.path.dirname(os.path.abspath(__file__)))
-
-# Tenta configurar o Django (pode falhar se não estiver em um ambiente Django)
-try:
-    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'arlicenter.settings')
-    import django
-    django.setup()
-    print("Django configurado com sucesso.")
-except Exception as e:
-    print(f"Aviso: Não foi possível configurar o Django: {str(e)}")
-    print("O script continuará, mas algumas funcionalidades podem não estar disponíveis.")
-
-# Agora importa o UserManager
-try:
-    from core.user_manager import UserManager
-    from core.firebase_config import initialize_firebase
-    print("UserManager importado com sucesso.")
-except Exception as e:
-    print(f"Erro ao importar UserManager: {str(e)}")
-    sys.exit(1)
+# Adiciona o diretório atual ao path (com guarda para não acumular
+# entradas duplicadas quando o módulo é importado mais de uma vez)
+_BASE_DIR = str(Path(__file__).resolve().parent)
+if _BASE_DIR not in sys.path:
+    sys.path.insert(0, _BASE_DIR)
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'arlicenter.settings')
+
+# O django.setup() (que carrega todos os INSTALLED_APPS) e o import do
+# UserManager são adiados para a primeira operação real: --help e erros de
+# validação de argumentos não devem pagar o bootstrap completo
+_bootstrapped = False
+
+# Compilado uma vez no import: um CPF válido tem exatamente 11 dígitos
+_CPF_RE = re.compile(r"^\d{11}$")
+
+def _normalizar_cpf(cpf):
+    """
+    Remove a formatação do CPF e valida o formato antes de qualquer I/O
+
+    Rejeitar um CPF malformado aqui evita a ida ao Firestore (e o bootstrap
+    do Django) para uma consulta que nunca encontraria nada.
+
+    Args:
+        cpf: CPF informado, com ou sem formatação
+
+    Returns:
+        str: CPF com apenas dígitos, ou None se o formato for inválido
+    """
+    digitos = re.sub(r"\D", "", cpf or "")
+    if not _CPF_RE.match(digitos):
+        print(f"CPF inválido: {cpf!r} (esperado 11 dígitos)")
+        return None
+    return digitos
+
+def _bootstrap():
+    """
+    Configura o Django sob demanda, uma única vez por processo
+    """
+    global _bootstrapped
+    if _bootstrapped:
+        return
+
+    # Tenta configurar o Django (pode falhar se não estiver em um ambiente Django)
+    try:
+        import django
+        django.setup()
+        print("Django configurado com sucesso.")
+    except Exception as e:
+        print(f"Aviso: Não foi possível configurar o Django: {str(e)}")
+        print("O script continuará, mas algumas funcionalidades podem não estar disponíveis.")
+
+    _bootstrapped = True
+
+# Instância compartilhada do UserManager: cada construção abre a conexão com
+# o Firestore (credenciais + canal gRPC), então os helpers reutilizam uma só
+_user_manager = None
+
+def _get_manager():
+    """
+    Retorna a instância compartilhada do UserManager, criando-a na primeira chamada
+
+    Returns:
+        UserManager: Instância única usada por todos os helpers do script
+    """
+    global _user_manager
+    if _user_manager is None:
+        _bootstrap()
+        try:
+            from core.user_manager import UserManager
+        except Exception as e:
+            print(f"Erro ao importar UserManager: {str(e)}")
+            sys.exit(1)
+        _user_manager = UserManager()
+    return _user_manager
 
 def testar_criar_colecao():
     """
     Testa a criação da coleção de usuários
     """
     print("\n=== Testando criação da coleção de usuários ===")
-    user_manager = UserManager()
+    user_manager = _get_manager()
     resultado = user_manager.create_collection()
     print(f"Resultado: {'Sucesso' if resultado else 'Falha'}")
     return resultado
@@ -46,8 +103,11 @@ def testar_criar_usuario(cpf, senha, id_contato_bling, nome=None, email=None, te
     Testa a criação de um novo usuário
     """
     print(f"\n=== Testando criação de usuário com CPF {cpf} ===")
-    user_manager = UserManager()
-    
+    cpf = _normalizar_cpf(cpf)
+    if cpf is None:
+        return None
+    user_manager = _get_manager()
+
     resultado = user_manager.create_user(
         cpf=cpf,
         senha=senha,
@@ -69,14 +129,19 @@ def testar_buscar_usuario(cpf):
     Testa a busca de um usuário pelo CPF
     """
     print(f"\n=== Testando busca de usuário com CPF {cpf} ===")
-    user_manager = UserManager()
-    
+    cpf = _normalizar_cpf(cpf)
+    if cpf is None:
+        return None
+    user_manager = _get_manager()
+
     usuario = user_manager.get_user_by_cpf(cpf)
     
     if usuario:
-        print(f"Usuário encontrado: {usuario.get('nome', 'Sem nome')}")
-        print(f"Status: {usuario.get('status', 'desconhecido')}")
-        print(f"ID no Bling: {usuario.get('id_contato_bling', 'não definido')}")
+        # Uma única escrita para o bloco de resultado, em vez de um print
+        # (e um flush em TTY) por linha
+        print(f"Usuário encontrado: {usuario.get('nome', 'Sem nome')}\n"
+              f"Status: {usuario.get('status', 'desconhecido')}\n"
+              f"ID no Bling: {usuario.get('id_contato_bling', 'não definido')}")
     else:
         print("Usuário não encontrado.")
     
@@ -87,8 +152,11 @@ def testar_verificar_senha(cpf, senha):
     Testa a verificação de senha
     """
     print(f"\n=== Testando verificação de senha para CPF {cpf} ===")
-    user_manager = UserManager()
-    
+    cpf = _normalizar_cpf(cpf)
+    if cpf is None:
+        return False
+    user_manager = _get_manager()
+
     resultado = user_manager.verify_password(cpf, senha)
     
     if resultado:
@@ -103,121 +171,212 @@ def testar_atualizar_usuario(cpf, dados):
     Testa a atualização de um usuário
     """
     print(f"\n=== Testando atualização de usuário com CPF {cpf} ===")
-    user_manager = UserManager()
-    
-    resultado = user_manager.update_user(cpf, dados)
-    
-    if resultado:
+    cpf = _normalizar_cpf(cpf)
+    if cpf is None:
+        return False
+    user_manager = _get_manager()
+
+    # update_and_fetch devolve o documento resultante sem a releitura que o
+    # par update_user + get_user_by_cpf fazia só para exibir os dados
+    usuario = user_manager.update_and_fetch(cpf, dados)
+
+    if usuario:
         print("Usuário atualizado com sucesso.")
-        # Busca o usuário atualizado para mostrar os dados
-        usuario = user_manager.get_user_by_cpf(cpf)
-        if usuario:
-            print(f"Dados atualizados: {usuario}")
+        print(f"Dados atualizados: {usuario}")
     else:
         print("Falha ao atualizar usuário.")
-    
-    return resultado
+
+    return usuario is not None
 
 def testar_desativar_usuario(cpf):
     """
     Testa a desativação de um usuário
     """
     print(f"\n=== Testando desativação de usuário com CPF {cpf} ===")
-    user_manager = UserManager()
-    
+    cpf = _normalizar_cpf(cpf)
+    if cpf is None:
+        return False
+    user_manager = _get_manager()
+
     resultado = user_manager.deactivate_user(cpf)
-    
+
     if resultado:
-        print("Usuário desativado com sucesso.")
-        # Confirma a desativação
-        usuario = user_manager.get_user_by_cpf(cpf)
-        if usuario and usuario.get('status') == 'inativo':
-            print("Status confirmado como inativo.")
-        else:
-            print("Erro: Status não foi atualizado corretamente.")
+        # O update do Firestore ou aplica ou lança exceção, então o retorno
+        # True já confirma o status — a releitura só refazia a mesma viagem
+        print("Usuário desativado com sucesso. Status: inativo.")
     else:
         print("Falha ao desativar usuário.")
-    
+
     return resultado
 
+def _prompt_fields(schema, legacy_prompts):
+    """
+    Lê vários campos numa única linha (JSON ou valores separados por '|')
+
+    Invocações automatizadas (echo ... | python test_user_manager.py) enviam
+    todos os campos numa única linha em vez de uma ida ao stdin por campo;
+    uma linha vazia cai no modo campo a campo tradicional para uso humano.
+
+    Args:
+        schema: Lista com os nomes dos campos, na ordem esperada
+        legacy_prompts: Prompts exibidos no modo campo a campo
+
+    Returns:
+        dict: Mapeamento campo -> valor (campos vazios viram None)
+    """
+    linha = input(f"Informe {' | '.join(schema)} (ou Enter para campo a campo): ").strip()
+
+    if linha.startswith('{'):
+        try:
+            valores = json.loads(linha)
+            return {campo: (valores.get(campo) or None) for campo in schema}
+        except json.JSONDecodeError:
+            print("JSON inválido; caindo para o modo campo a campo.")
+            linha = ''
+
+    if linha:
+        partes = [p.strip() for p in linha.split('|')]
+        partes += [''] * (len(schema) - len(partes))
+        return {campo: (valor or None) for campo, valor in zip(schema, partes)}
+
+    return {campo: (input(prompt).strip() or None) for campo, prompt in zip(schema, legacy_prompts)}
+
 def modo_interativo():
     """
     Executa o script em modo interativo
     """
     print("\n=== TESTE DO GERENCIADOR DE USUÁRIOS ===\n")
-    
+
     # Testa a criação da coleção
     testar_criar_colecao()
-    
+
+    def opcao_criar():
+        campos = _prompt_fields(
+            ["cpf", "senha", "id_contato", "nome", "email", "telefone"],
+            ["CPF (sem formatação): ", "Senha: ", "ID do contato no Bling: ",
+             "Nome (opcional): ", "Email (opcional): ", "Telefone (opcional): "])
+
+        testar_criar_usuario(campos['cpf'], campos['senha'], campos['id_contato'],
+                             campos['nome'], campos['email'], campos['telefone'])
+
+    def opcao_buscar():
+        cpf = input("CPF (sem formatação): ").strip()
+        testar_buscar_usuario(cpf)
+
+    def opcao_verificar():
+        cpf = input("CPF (sem formatação): ").strip()
+        senha = input("Senha: ").strip()
+        testar_verificar_senha(cpf, senha)
+
+    def opcao_atualizar():
+        cpf = input("CPF (sem formatação): ").strip()
+        print("Insira os campos a serem atualizados (deixe em branco para manter o valor atual)")
+        campos = _prompt_fields(
+            ["nome", "email", "telefone", "senha"],
+            ["Nome: ", "Email: ", "Telefone: ",
+             "Nova senha (deixe em branco para não alterar): "])
+
+        dados = {campo: valor for campo, valor in campos.items() if valor}
+
+        if dados:
+            testar_atualizar_usuario(cpf, dados)
+        else:
+            print("Nenhum dado fornecido para atualização.")
+
+    def opcao_desativar():
+        cpf = input("CPF (sem formatação): ").strip()
+        confirma = input(f"Tem certeza que deseja desativar o usuário com CPF {cpf}? (s/n): ").strip().lower()
+
+        if confirma == 's':
+            testar_desativar_usuario(cpf)
+        else:
+            print("Operação cancelada.")
+
+    # Despacho por dicionário montado uma vez, em vez de reavaliar a cadeia
+    # de if/elif a cada volta do laço; também deixa cada opção testável isolada
+    handlers = {
+        "1": opcao_criar,
+        "2": opcao_buscar,
+        "3": opcao_verificar,
+        "4": opcao_atualizar,
+        "5": opcao_desativar,
+    }
+
+    menu = "\n".join([
+        "\nSelecione uma operação:",
+        "1. Criar usuário",
+        "2. Buscar usuário",
+        "3. Verificar senha",
+        "4. Atualizar usuário",
+        "5. Desativar usuário",
+        "0. Sair",
+    ])
+
     while True:
-        print("\nSelecione uma operação:")
-        print("1. Criar usuário")
-        print("2. Buscar usuário")
-        print("3. Verificar senha")
-        print("4. Atualizar usuário")
-        print("5. Desativar usuário")
-        print("0. Sair")
-        
+        print(menu)
+
         opcao = input("Opção: ").strip()
-        
+
         if opcao == "0":
             print("Encerrando...")
             break
-        
-        elif opcao == "1":
-            cpf = input("CPF (sem formatação): ").strip()
-            senha = input("Senha: ").strip()
-            id_contato = input("ID do contato no Bling: ").strip()
-            nome = input("Nome (opcional): ").strip() or None
-            email = input("Email (opcional): ").strip() or None
-            telefone = input("Telefone (opcional): ").strip() or None
-            
-            testar_criar_usuario(cpf, senha, id_contato, nome, email, telefone)
-        
-        elif opcao == "2":
-            cpf = input("CPF (sem formatação): ").strip()
-            testar_buscar_usuario(cpf)
-        
-        elif opcao == "3":
-            cpf = input("CPF (sem formatação): ").strip()
-            senha = input("Senha: ").strip()
-            testar_verificar_senha(cpf, senha)
-        
-        elif opcao == "4":
-            cpf = input("CPF (sem formatação): ").strip()
-            print("Insira os campos a serem atualizados (deixe em branco para manter o valor atual)")
-            nome = input("Nome: ").strip() or None
-            email = input("Email: ").strip() or None
-            telefone = input("Telefone: ").strip() or None
-            nova_senha = input("Nova senha (deixe em branco para não alterar): ").strip() or None
-            
-            dados = {}
-            if nome:
-                dados['nome'] = nome
-            if email:
-                dados['email'] = email
-            if telefone:
-                dados['telefone'] = telefone
-            if nova_senha:
-                dados['senha'] = nova_senha
-            
-            if dados:
-                testar_atualizar_usuario(cpf, dados)
-            else:
-                print("Nenhum dado fornecido para atualização.")
-        
-        elif opcao == "5":
-            cpf = input("CPF (sem formatação): ").strip()
-            confirma = input(f"Tem certeza que deseja desativar o usuário com CPF {cpf}? (s/n): ").strip().lower()
-            
-            if confirma == 's':
-                testar_desativar_usuario(cpf)
-            else:
-                print("Operação cancelada.")
-        
+
+        handler = handlers.get(opcao)
+        if handler:
+            handler()
         else:
             print("Opção inválida.")
 
+def modo_daemon():
+    """
+    Lê operações como linhas JSON do stdin e responde com JSON no stdout
+
+    Cada invocação avulsa do script paga o django.setup() e a abertura da
+    conexão com o Firestore; em modo daemon o processo fica vivo e esse
+    custo é amortizado sobre milhares de operações. Formato de entrada:
+    {"op": "verify", "cpf": "...", "senha": "..."} — uma operação por linha.
+    """
+    user_manager = _get_manager()
+
+    operacoes = {
+        'create': lambda pedido: user_manager.create_user(
+            cpf=pedido.get('cpf'),
+            senha=pedido.get('senha'),
+            id_contato_bling=pedido.get('id_contato'),
+            nome=pedido.get('nome'),
+            email=pedido.get('email'),
+            telefone=pedido.get('telefone')
+        ),
+        'get': lambda pedido: user_manager.get_user_by_cpf(pedido.get('cpf')),
+        'verify': lambda pedido: user_manager.verify_password(pedido.get('cpf'), pedido.get('senha')),
+        'update': lambda pedido: user_manager.update_and_fetch(pedido.get('cpf'), pedido.get('dados') or {}),
+        'deactivate': lambda pedido: user_manager.deactivate_user(pedido.get('cpf')),
+    }
+
+    for linha in sys.stdin:
+        linha = linha.strip()
+        if not linha:
+            continue
+
+        try:
+            pedido = json.loads(linha)
+        except json.JSONDecodeError:
+            print(json.dumps({'ok': False, 'erro': 'JSON inválido'}), flush=True)
+            continue
+
+        op = pedido.get('op')
+        operacao = operacoes.get(op)
+
+        if operacao is None:
+            print(json.dumps({'ok': False, 'erro': f'Operação desconhecida: {op}'}), flush=True)
+            continue
+
+        try:
+            resultado = operacao(pedido)
+            print(json.dumps({'ok': True, 'op': op, 'resultado': resultado}, default=str), flush=True)
+        except Exception as e:
+            print(json.dumps({'ok': False, 'op': op, 'erro': str(e)}), flush=True)
+
 def main():
     parser = argparse.ArgumentParser(description='Teste do Gerenciador de Usuários')
     parser.add_argument('--create', action='store_true', help='Criar a coleção de usuários')
@@ -233,24 +392,51 @@ def main():
     parser.add_argument('--nome', help='Nome do usuário')
     parser.add_argument('--email', help='Email do usuário')
     parser.add_argument('--telefone', help='Telefone do usuário')
-    
+    parser.add_argument('--parallel', action='store_true', help='Executar consultas independentes (--get, --verify) em paralelo')
+    parser.add_argument('--daemon', action='store_true', help='Ler operações como linhas JSON do stdin e responder em JSON')
+    parser.add_argument('--json', action='store_true', help='Imprimir os resultados como JSON no stdout (progresso vai para stderr)')
+
     args = parser.parse_args()
-    
+
     # Se nenhum argumento for fornecido, executa em modo interativo
     if len(sys.argv) == 1:
         modo_interativo()
         return
-    
-    # Executa as operações solicitadas
+
+    if args.daemon:
+        modo_daemon()
+        return
+
+    # Executa as operações solicitadas, coletando os retornos por operação
+    resultados = {}
+
+    if args.json:
+        # stdout fica reservado para o JSON final; os prints de progresso
+        # dos helpers seguem visíveis no stderr sem precisar passar uma
+        # flag de silêncio por cada testar_*
+        with contextlib.redirect_stdout(sys.stderr):
+            _executar_operacoes(args, resultados)
+        print(json.dumps(resultados, default=str))
+    else:
+        _executar_operacoes(args, resultados)
+
+def _executar_operacoes(args, resultados):
+    """
+    Executa as operações pedidas na linha de comando
+
+    Args:
+        args: Argumentos já processados pelo argparse
+        resultados: Dicionário preenchido com o retorno de cada operação
+    """
     if args.create:
-        testar_criar_colecao()
-    
+        resultados['create'] = testar_criar_colecao()
+
     if args.add:
         if not args.cpf or not args.senha or not args.id_contato:
             print("Erro: Para adicionar um usuário, forneça --cpf, --senha e --id-contato")
             return
-        
-        testar_criar_usuario(
+
+        resultados['add'] = testar_criar_usuario(
             args.cpf,
             args.senha,
             args.id_contato,
@@ -258,26 +444,42 @@ def main():
             args.email,
             args.telefone
         )
-    
+
+    # --get e --verify são leituras independentes entre si; com --parallel as
+    # duas vão para um pool de threads e a espera vira max() das latências do
+    # Firestore em vez da soma (o cliente gRPC é thread-safe). As operações
+    # com pré-requisitos (--create, --add) já rodaram acima, e as escritas
+    # (--update, --deactivate) continuam sequenciais depois.
+    consultas = []
+
     if args.get:
         if not args.cpf:
             print("Erro: Para buscar um usuário, forneça --cpf")
             return
-        
-        testar_buscar_usuario(args.cpf)
-    
+
+        consultas.append(('get', lambda: testar_buscar_usuario(args.cpf)))
+
     if args.verify:
         if not args.cpf or not args.senha:
             print("Erro: Para verificar senha, forneça --cpf e --senha")
             return
-        
-        testar_verificar_senha(args.cpf, args.senha)
-    
+
+        consultas.append(('verify', lambda: testar_verificar_senha(args.cpf, args.senha)))
+
+    if args.parallel and len(consultas) > 1:
+        with ThreadPoolExecutor(max_workers=len(consultas)) as executor:
+            futures = [(nome, executor.submit(consulta)) for nome, consulta in consultas]
+            for nome, future in futures:
+                resultados[nome] = future.result()
+    else:
+        for nome, consulta in consultas:
+            resultados[nome] = consulta()
+
     if args.update:
         if not args.cpf:
             print("Erro: Para atualizar um usuário, forneça --cpf")
             return
-        
+
         dados = {}
         if args.nome:
             dados['nome'] = args.nome
@@ -287,18 +489,18 @@ def main():
             dados['telefone'] = args.telefone
         if args.senha:
             dados['senha'] = args.senha
-        
+
         if dados:
-            testar_atualizar_usuario(args.cpf, dados)
+            resultados['update'] = testar_atualizar_usuario(args.cpf, dados)
         else:
             print("Nenhum dado fornecido para atualização.")
-    
+
     if args.deactivate:
         if not args.cpf:
             print("Erro: Para desativar um usuário, forneça --cpf")
             return
-        
-        testar_desativar_usuario(args.cpf)
+
+        resultados['deactivate'] = testar_desativar_usuario(args.cpf)
 
 if __name__ == "__main__":
     main() 
\ No newline at end of file
@@ -7,45 +7,67 @@ e se a conexão com o Firestore pode ser estabelecida.
 
 import os
 import sys
-import django
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 
 # Adiciona o diretório pai ao path para poder importar o projeto Django
-sys.path.append(str(Path(__file__).resolve().parent))
+# (com guarda para não acumular entradas duplicadas em reimportações)
+_BASE_DIR = str(Path(__file__).resolve().parent)
+if _BASE_DIR not in sys.path:
+    sys.path.insert(0, _BASE_DIR)
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "arlicenter.settings")
-django.setup()
 
-# Agora podemos importar do projeto Django
-from core.firebase_config import initialize_firebase
+def _validar_caminho(db, path):
+    """
+    Escreve e remove um documento de teste na coleção indicada.
+
+    O batch aceito sem exceção já prova a conectividade de escrita naquele
+    caminho, então não há releitura de confirmação nem delete separado.
+
+    Args:
+        db: Cliente do Firestore já inicializado
+        path: Nome da coleção a validar
+    """
+    from django.utils import timezone
+
+    test_ref = db.collection(path).document('test_doc')
+    batch = db.batch()
+    batch.set(test_ref, {
+        'timestamp': timezone.now().isoformat(),
+        'message': 'Conexão de teste bem-sucedida'
+    })
+    batch.delete(test_ref)
+    batch.commit()
 
-def validate_firebase_connection():
+def validate_firebase_connection(paths=('test_connection',)):
     """
     Testa a conexão com o Firebase/Firestore.
+
+    Args:
+        paths: Coleções a validar. Com mais de uma, as validações rodam em
+            paralelo num pool de threads (o cliente gRPC é thread-safe) e a
+            espera vira a maior latência em vez da soma delas.
     """
+    # Bootstrap adiado: importar este módulo não deve pagar o django.setup()
+    # (carregamento dos INSTALLED_APPS) nem a inicialização do Firestore
+    import django
+    django.setup()
+    from core.firebase_config import initialize_firebase
+
     try:
         # Inicializa o Firebase
         db = initialize_firebase()
-        
-        # Tenta criar uma coleção de teste
-        test_ref = db.collection('test_connection').document('test_doc')
-        test_ref.set({
-            'timestamp': django.utils.timezone.now().isoformat(),
-            'message': 'Conexão de teste bem-sucedida'
-        })
-        
-        # Lê o documento para confirmar a escrita
-        test_doc = test_ref.get()
-        if test_doc.exists:
-            print("✅ Conexão com o Firebase estabelecida com sucesso!")
-            print(f"Dados do documento: {test_doc.to_dict()}")
-            
-            # Limpa o documento de teste
-            test_ref.delete()
-            return True
+
+        if len(paths) == 1:
+            _validar_caminho(db, paths[0])
         else:
-            print("❌ Falha ao ler o documento de teste após a escrita.")
-            return False
-    
+            with ThreadPoolExecutor(max_workers=len(paths)) as executor:
+                # list() propaga a primeira exceção de qualquer caminho
+                list(executor.map(lambda path: _validar_caminho(db, path), paths))
+
+        print("✅ Conexão com o Firebase estabelecida com sucesso!")
+        return True
+
     except Exception as e:
         print(f"❌ Erro ao validar conexão com o Firebase: {e}")
         return False